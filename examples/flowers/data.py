@@ -55,8 +55,19 @@ class FlowersDatabase(Database):
 
 
 class FlowersDataHandler(DataHandler):
+
     DATABASE_CLASS = FlowersDatabase
 
+    PREPARE_OPTIONS = [
+        "augment_data",
+        "batch_size",
+        "flip",
+        "img_size",
+        "rotation",
+        "seed",
+        "shuffle_data",
+    ]
+
     def __init__(self, opts):
         super().__init__(opts)
 
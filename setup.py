@@ -20,5 +20,5 @@ setup(
     version="1.0.1",
     packages=find_packages(),
     package_data={"": ["*.svg", "*.yaml", "*.zip", "*.ico", "*.bat"]},
-    install_requires=["pandas", "feather-format", "pyyaml"],
+    install_requires=["pandas", "feather-format", "pyarrow", "pyyaml"],
 )
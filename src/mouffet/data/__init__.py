@@ -3,6 +3,7 @@ from .data_loader import DataLoader
 from .data_structure import DataStructure
 from .dataset import Dataset
 from .database import Database
+from .prefetch import Prefetcher
 
 
 DB_TYPE_TRAINING = "training"
@@ -1,5 +1,10 @@
+import copy
+
+import pandas as pd
+
 from ..utils import common_utils
 from .database import Database
+from .prefetch import Prefetcher
 
 
 class DataHandler:
@@ -13,15 +18,32 @@ class DataHandler:
 
         "generate_file_lists", "Should file lists be regenerated", False, "bool"
         "data_by_type", "Is the database split by type", False, "bool"
-
+        "dataset_cache_size", "Number of loaded datasets kept in memory. Copies of cached datasets are returned", 0, "int"
+        "prepared_dataset_cache_size", "Number of prepared datasets kept in memory", 0, "int"
+        "prefetch_depth", "Number of items prepared in advance by prefetch()", 2, "int"
+        "prefetch_executor", "Run prefetching in a 'thread' or a 'process'", "thread", "str"
+
+    Attributes:
+        PREPARE_OPTIONS: Names of the model options used to prepare datasets. Prepared
+        datasets are cached using only these options, so that models that only differ by
+        other options share the same prepared datasets. If None, all model options are used.
     """
 
     DATABASE_CLASS = Database
 
+    PREPARE_OPTIONS = None
+
     def __init__(self, opts):
         self.opts = opts
         # self.tmp_db_data = None
         self.databases = self.load_databases()
+        self.dataset_cache = common_utils.LRUCache(
+            self.opts.get("dataset_cache_size", 0)
+        )
+        self.prepared_dataset_cache = common_utils.LRUCache(
+            self.opts.get("prepared_dataset_cache_size", 0)
+        )
+        self.checked_datasets = set()
 
     def load_databases(self):
         """Loads all databases defined in the 'databases' option of the configuration file.
@@ -98,12 +120,30 @@ class DataHandler:
             )
         return None
 
-    def check_datasets(self, databases=None, db_types=None):
+    def check_datasets(self, databases=None, db_types=None, force=False):
+        """Check that the datasets of databases exist and generate them if needed. Databases
+        that have already been checked with the same options are skipped unless force is
+        True.
+
+        Args:
+            databases (list, optional): The databases to check. Defaults to None, meaning all
+            databases.
+            db_types (list, optional): The types of datasets to check. Defaults to None.
+            force (bool, optional): Check databases even if they have already been checked.
+            Defaults to False.
+        """
         databases = databases or self.databases.values()
         for database in databases:
             if isinstance(database, str):
                 database = self.databases[database]
+            key = (
+                common_utils.get_options_fingerprint(database.opts),
+                str(db_types),
+            )
+            if key in self.checked_datasets and not force:
+                continue
             database.check_database(db_types)
+            self.checked_datasets.add(key)
 
     def merge_datasets(self, datasets):
         merged = None
@@ -129,6 +169,26 @@ class DataHandler:
         """
         return dataset
 
+    def prefetch(self, iterable, transform=None):
+        """Iterate over an iterable (e.g. batches of a dataset) in the background so that
+        loading and preparing the next items overlaps with the use of the current one, for
+        instance during training or in predict_database(). See mouffet.data.Prefetcher.
+
+        Args:
+            iterable (iterable): The items to iterate over
+            transform (callable, optional): Function applied to each item in the background.
+            Defaults to None.
+
+        Returns:
+            mouffet.data.Prefetcher: An iterable over the (transformed) items
+        """
+        return Prefetcher(
+            iterable,
+            depth=self.opts.get("prefetch_depth", 2),
+            executor=self.opts.get("prefetch_executor", "thread"),
+            transform=transform,
+        )
+
     def get_database(self, name):
         return self.databases.get(name, None)
 
@@ -179,17 +239,107 @@ class DataHandler:
         prepare_opts=None,
     ):
         load_opts = load_opts or {}
-        dataset = database.load_dataset(db_type, load_opts)
-        if prepare:
-            if prepare_func is None:
-                db_func_name = "prepare_" + db_type + "_dataset"
-                if hasattr(self, db_func_name):
-                    prepare_func = getattr(self, db_func_name)
-                else:
-                    prepare_func = self.prepare_dataset
-            dataset = prepare_func(dataset, prepare_opts)
+        if not prepare:
+            return self.load_cached_dataset(db_type, database, load_opts)
+        if prepare_func is None:
+            db_func_name = "prepare_" + db_type + "_dataset"
+            if hasattr(self, db_func_name):
+                prepare_func = getattr(self, db_func_name)
+            else:
+                prepare_func = self.prepare_dataset
+        key = None
+        if self.prepared_dataset_cache.maxsize:
+            key = self.get_prepared_dataset_cache_key(
+                db_type, database, load_opts, prepare_func, prepare_opts
+            )
+            dataset = self.prepared_dataset_cache.get(key, None)
+            if dataset is not None:
+                print(
+                    "Using cached prepared {} dataset for database {}".format(
+                        db_type, database.name
+                    )
+                )
+                return dataset
+        dataset = self.load_cached_dataset(db_type, database, load_opts)
+        dataset = prepare_func(dataset, prepare_opts)
+        if key is not None and dataset:
+            self.prepared_dataset_cache[key] = dataset
         return dataset
 
+    def get_prepare_options(self, prepare_opts):
+        """Get the options used to prepare a dataset. See PREPARE_OPTIONS.
+
+        Args:
+            prepare_opts (dict or mouffet.options.ModelOptions): The model options
+
+        Returns:
+            dict: The options used to prepare the dataset
+        """
+        if prepare_opts is None or self.PREPARE_OPTIONS is None:
+            return prepare_opts
+        return {name: prepare_opts.get(name, None) for name in self.PREPARE_OPTIONS}
+
+    def get_prepared_dataset_cache_key(
+        self, db_type, database, load_opts, prepare_func, prepare_opts
+    ):
+        return self.get_dataset_cache_key(db_type, database, load_opts) + (
+            getattr(prepare_func, "__name__", str(prepare_func)),
+            common_utils.get_options_fingerprint(
+                self.get_prepare_options(prepare_opts)
+            ),
+        )
+
+    def clear_cache(self):
+        """Discard all loaded and prepared datasets kept in memory"""
+        self.dataset_cache.clear()
+        self.prepared_dataset_cache.clear()
+
+    def get_dataset_cache_key(self, db_type, database, load_opts):
+        return (
+            common_utils.get_options_fingerprint(database.opts),
+            db_type,
+            common_utils.get_options_fingerprint(load_opts),
+        )
+
+    def load_cached_dataset(self, db_type, database, load_opts):
+        """Load a dataset using the dataset cache. Datasets are cached using the options of the
+        database, the type of dataset and the loading options as a key. The size of the cache
+        is defined by the 'dataset_cache_size' option. Since datasets can be modified, for
+        instance during their preparation or evaluation, a copy of the cached dataset is
+        returned: dataframes are copied and lists are copied without copying their items.
+
+        Args:
+            db_type (str): The type of dataset to load
+            database (mouffet.data.Database): The database of the dataset
+            load_opts (dict): The loading options
+
+        Returns:
+            mouffet.data.Dataset: The loaded dataset
+        """
+        if not self.dataset_cache.maxsize:
+            return database.load_dataset(db_type, load_opts)
+        key = self.get_dataset_cache_key(db_type, database, load_opts)
+        dataset = self.dataset_cache.get(key, None)
+        if dataset is None:
+            dataset = database.load_dataset(db_type, load_opts)
+            if not dataset:
+                return dataset
+            self.dataset_cache[key] = dataset
+        else:
+            print(
+                "Using cached {} dataset for database {}".format(db_type, database.name)
+            )
+        res = copy.copy(dataset)
+        res.data = {
+            key: (
+                value.copy()
+                if isinstance(value, pd.DataFrame)
+                else list(value) if isinstance(value, list) else value
+            )
+            for key, value in dataset.data.items()
+        }
+        return res
+
     def get_summaries(self, db_types=None, databases=None, all=False, load_opts=None):
         res = {}
         databases = databases or self.databases.values()
@@ -1,11 +1,14 @@
+import copy
 import pickle
 import traceback
+from functools import partial
 from pathlib import Path
-import feather
 
 import pandas as pd
+import pyarrow as pa
 
-from ..utils import common_utils
+from ..utils import common_utils, file_utils
+from . import storage
 
 
 class DataLoader:
@@ -59,46 +62,286 @@ class DataLoader:
         (e.g. dataframe concatenation)
         """
 
-    def generate_dataset(
-        self, database, paths, file_list, db_type, missing=None, overwrite=False
+    def merge_file_data(self, file_data):
+        """Merge the data loaded for a single file into the data of the loader. Only used
+        when files are loaded in separate copies of the data structure (see load_files()).
+        Lists are extended, dataframes are concatenated and dicts are updated. Any other
+        value replaces the current one: loaders that accumulate other types of values (e.g.
+        numpy arrays or counters) should override this method to use parallel loading or
+        intermediate results.
+
+        Args:
+            file_data (dict): The data loaded for a single file, with the same keys as the
+            data structure
+        """
+        for key, value in file_data.items():
+            current = self.data.get(key, None)
+            if isinstance(current, list) and isinstance(value, list):
+                current += value
+            elif isinstance(current, pd.DataFrame) and isinstance(value, pd.DataFrame):
+                self.data[key] = pd.concat([current, value])
+            elif isinstance(current, dict) and isinstance(value, dict):
+                current.update(value)
+            else:
+                self.data[key] = value
+
+    @staticmethod
+    def get_options_key(db_opts):
+        return common_utils.get_options_fingerprint(db_opts)
+
+    def load_intermediate(self, path, fingerprint, options_key, keys):
+        """Load the data of a file from its intermediate results. Intermediate results are
+        only reused if they were generated from the same version of the source file, with the
+        same dataset options and for at least the same keys.
+
+        Args:
+            path (pathlib.Path): The path of the intermediate results
+            fingerprint (str): The fingerprint of the source file
+            options_key (str): A key identifying the dataset options
+            keys (list): The keys of the structure to generate
+
+        Returns:
+            dict: The data of the file or None if the intermediate results are not valid
+        """
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+        except Exception:
+            return None
+        if (
+            not isinstance(saved, dict)
+            or saved.get("fingerprint", None) != fingerprint
+            or saved.get("options", None) != options_key
+            or not set(keys).issubset(saved.get("keys", []))
+        ):
+            return None
+        return saved["data"]
+
+    def load_file(
+        self,
+        file_path,
+        template,
+        tags_dir,
+        db_opts,
+        missing=None,
+        intermediate_dir=None,
+        overwrite=False,
+        fingerprint_method="stat",
     ):
-        """[summary]
+        """Load the data of a single file in a fresh copy of the data structure. This allows
+        files to be loaded independently, possibly in another thread or process, and merged
+        afterwards in the order of the file list.
+        If intermediate_dir is provided, the data of the file is saved there along with
+        the value returned by load_file_data(). These intermediate results are reused
+        instead of loading the file again as long as the file has not changed, which makes
+        interrupted generations resumable.
 
         Args:
-            database ([type]): [description]
-            paths ([type]): [description]
-            file_list ([type]): [description]
-            db_type ([type]): [description]
-            overwrite ([type]): [description]
+            file_path (pathlib.Path): The path of the file to load
+            template (dict): An empty copy of the data structure
+            tags_dir (pathlib.Path): The directory where tags are located
+            db_opts (dict): The options returned by dataset_options()
+            missing (list, optional): The keys of the structure to generate. Defaults to None.
+            intermediate_dir (pathlib.Path, optional): Where to save intermediate results.
+            If None, intermediate results are not saved. Defaults to None.
+            overwrite (bool, optional): Do not reuse existing intermediate results.
+            Defaults to False.
+            fingerprint_method (str, optional): How to detect if a file has changed since its
+            intermediate results were saved. See file_utils.get_file_fingerprint().
+            Defaults to "stat".
+
+        Returns:
+            dict: The data loaded for this file or None if an error occurred
         """
-        db_opts = self.dataset_options(database)
+        loader = copy.copy(self)
+        loader.data = copy.deepcopy(template)
+        try:
+            savename = None
+            if intermediate_dir is not None:
+                savename = (intermediate_dir / file_path.name).with_suffix(".pkl")
+                keys = missing or list(template.keys())
+                fingerprint = file_utils.get_file_fingerprint(
+                    file_path, fingerprint_method
+                )
+                options_key = self.get_options_key(db_opts)
+                if savename.exists() and not overwrite:
+                    file_data = self.load_intermediate(
+                        savename, fingerprint, options_key, keys
+                    )
+                    if file_data is not None:
+                        return file_data
+
+            intermediate = loader.load_file_data(
+                file_path=file_path,
+                tags_dir=tags_dir,
+                opts=db_opts,
+                missing=missing,
+            )
+
+            if savename is not None:
+                with file_utils.atomic_open(savename, "wb") as f:
+                    pickle.dump(
+                        {
+                            "fingerprint": fingerprint,
+                            "options": options_key,
+                            "keys": keys,
+                            "intermediate": intermediate,
+                            "data": loader.data,
+                        },
+                        f,
+                        -1,
+                    )
+        except Exception:
+            print("Error loading: " + str(file_path) + ", skipping.")
+            print(traceback.format_exc())
+            return None
+        return loader.data
+
+    def finalize_file_data(self, file_data, missing=None):
+        """Call finalize_dataset() on the data of a single file. Used when files are kept
+        separated after loading, for instance when generating a dataset incrementally.
+
+        Args:
+            file_data (dict): The data loaded for a single file
+            missing (list, optional): The keys of the structure to generate. Defaults to None.
+
+        Returns:
+            dict: The finalized data
+        """
+        loader = copy.copy(self)
+        loader.data = file_data
+        loader.finalize_dataset(missing)
+        return loader.data
+
+    @staticmethod
+    def get_tags_dir(database, paths, db_type):
         split = database.get("split", {})
         if split and db_type in split:
-            tags_dir = paths["tags"]["training"]
+            return paths["tags"]["training"]
+        return paths["tags"][db_type]
+
+    def iter_file_data(
+        self, database, paths, file_list, db_type, missing=None, overwrite=False
+    ):
+        """Load all files of file_list and yield their data one by one, in the order of the
+        file list. If the 'n_workers' database option is greater than 1, files are loaded in
+        parallel using the executor described by the 'executor' option ("process" or "thread").
+
+        Args:
+            database (mouffet.data.Database): The database of the dataset
+            paths (dict): The paths of the database
+            file_list (list): The files to load
+            db_type (str): The type of dataset to generate
+            missing (list, optional): The keys of the structure to generate. Defaults to None.
+            overwrite (bool, optional): Overwrite existing intermediate results.
+            Defaults to False.
+
+        Yields:
+            tuple: The path of the file and its data. The data is None if an error occurred
+        """
+        db_opts = self.dataset_options(database)
+        tags_dir = self.get_tags_dir(database, paths, db_type)
+        intermediate_dir = None
+        if database.save_intermediates:
+            intermediate_dir = paths["dest"][db_type] / "intermediate"
+
+        file_list = [Path(file_path) for file_path in file_list]
+        template = copy.deepcopy(self.data)
+        # * Workers get a loader without the data already merged, otherwise each task sent
+        # * to a process would contain the dataset generated so far
+        worker_loader = copy.copy(self)
+        worker_loader.data = template
+        load_file = partial(
+            worker_loader.load_file,
+            template=template,
+            tags_dir=tags_dir,
+            db_opts=db_opts,
+            missing=missing,
+            intermediate_dir=intermediate_dir,
+            overwrite=overwrite,
+            fingerprint_method=database.file_fingerprint,
+        )
+        n_workers = database.n_workers
+        if n_workers > 1 and len(file_list) > 1:
+            print(
+                "Loading {} files using {} {} workers".format(
+                    len(file_list), n_workers, database.executor
+                )
+            )
+            with common_utils.get_executor(n_workers, database.executor) as executor:
+                chunksize = max(1, len(file_list) // (n_workers * 4))
+                yield from zip(
+                    file_list, executor.map(load_file, file_list, chunksize=chunksize)
+                )
         else:
-            tags_dir = paths["tags"][db_type]
+            for file_path in file_list:
+                yield file_path, load_file(file_path)
+
+    def load_files(
+        self, database, paths, file_list, db_type, missing=None, overwrite=False
+    ):
+        """Load all files of file_list into the data of the loader, in the order of the file
+        list, and yield the path of each loaded file. By default, load_file_data() fills
+        self.data directly. If files are loaded in parallel (see the 'n_workers' database
+        option) or their intermediate results are saved, each file is loaded in a copy of
+        the data structure (see iter_file_data()) and merged with merge_file_data().
+
+        Args:
+            database (mouffet.data.Database): The database of the dataset
+            paths (dict): The paths of the database
+            file_list (list): The files to load
+            db_type (str): The type of dataset to generate
+            missing (list, optional): The keys of the structure to generate. Defaults to None.
+            overwrite (bool, optional): Overwrite existing intermediate results.
+            Defaults to False.
+
+        Yields:
+            pathlib.Path: The path of each file loaded successfully
+        """
+        if database.n_workers > 1 or database.save_intermediates:
+            for file_path, file_data in self.iter_file_data(
+                database, paths, file_list, db_type, missing, overwrite
+            ):
+                if file_data is not None:
+                    self.merge_file_data(file_data)
+                    yield file_path
+            return
+        db_opts = self.dataset_options(database)
+        tags_dir = self.get_tags_dir(database, paths, db_type)
         for file_path in file_list:
+            file_path = Path(file_path)
             try:
-                if not isinstance(file_path, Path):
-                    file_path = Path(file_path)
-                intermediate = self.load_file_data(
+                self.load_file_data(
                     file_path=file_path,
                     tags_dir=tags_dir,
                     opts=db_opts,
                     missing=missing,
                 )
-
-                if database.save_intermediates:
-                    savename = (
-                        paths["dest"][db_type] / "intermediate" / file_path.name
-                    ).with_suffix(".pkl")
-                    if not savename.exists() or overwrite:
-                        with open(savename, "wb") as f:
-                            pickle.dump(intermediate, f, -1)
             except Exception:
                 print("Error loading: " + str(file_path) + ", skipping.")
                 print(traceback.format_exc())
-                # self.data = None
+                continue
+            yield file_path
+
+    def generate_dataset(
+        self, database, paths, file_list, db_type, missing=None, overwrite=False
+    ):
+        """Generate the dataset by loading all files in file_list (see load_files()) then
+        calling finalize_dataset().
+
+        Args:
+            database (mouffet.data.Database): The database of the dataset
+            paths (dict): The paths of the database
+            file_list (list): The files to load
+            db_type (str): The type of dataset to generate
+            missing (list, optional): The keys of the structure to generate. Defaults to None.
+            overwrite (bool, optional): Overwrite existing intermediate results.
+            Defaults to False.
+        """
+        for _ in self.load_files(
+            database, paths, file_list, db_type, missing, overwrite
+        ):
+            pass
         self.finalize_dataset(missing)
 
     def get_file_types(self, load_opts):
@@ -128,20 +371,54 @@ class DataLoader:
                         str(path)
                     )
                 )
-            tmp = self.load_dataset_file(path)
+            tmp = self.load_dataset_file(path, **self.get_read_options(key, load_opts))
             callback = self.CALLBACKS.get("onload", {}).get(key, None)
             if callback:
                 tmp = callback(tmp)
             self.data[key] = tmp
 
-    def load_dataset_file(self, file_name):
+    def get_read_options(self, key, load_opts):
+        """Get the options passed to the storage backend when loading a key of the structure.
+        Supported options are:
+
+        - memory_map: Memory map files instead of reading them
+        - lazy: Only read data when accessed, when supported by the storage backend.
+          Items of lists of arrays are then loaded one by one
+        - lazy_cache_size: With lazy, the number of loaded items kept in memory
+        - as_arrow: Load feather files as pyarrow Tables instead of pandas dataframes
+        - columns: A dict with the columns to read for each key. For example,
+          {"tags_df": ["file_id", "start", "end"]}
+        - filters: A dict with row filters for each key. Filters are dicts where keys are
+          column names and values are either the value or list of values to keep. For
+          example, {"tags_df": {"label": ["bird", "insect"]}}
+
+        Args:
+            key (str): The key of the structure
+            load_opts (dict): The loading options
+
+        Returns:
+            dict: The options set in load_opts
+        """
+        res = {
+            name: load_opts[name]
+            for name in ["memory_map", "as_arrow", "lazy"]
+            if name in load_opts
+        }
+        if load_opts.get("lazy", False):
+            res["cache_size"] = load_opts.get("lazy_cache_size", 128)
+        for name in ["columns", "filters"]:
+            value = load_opts.get(name, {}).get(key, None)
+            if value:
+                res[name] = value
+        return res
+
+    def load_dataset_file(self, file_name, **kwargs):
         print("Loading file: ", file_name)
-        if file_name.suffix == ".feather":
-            df = feather.read_dataframe(str(file_name))
-            if df.empty:
-                common_utils.print_warning(
-                    "Warning, loaded dataset file {} is empty".format(file_name)
-                )
-            return df
-        else:
-            return pickle.load(open(file_name, "rb"))
+        value = storage.get_storage(file_name).read(file_name, **kwargs)
+        if (isinstance(value, pd.DataFrame) and value.empty) or (
+            isinstance(value, pa.Table) and not value.num_rows
+        ):
+            common_utils.print_warning(
+                "Warning, loaded dataset file {} is empty".format(file_name)
+            )
+        return value
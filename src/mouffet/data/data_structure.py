@@ -4,7 +4,13 @@ from ..utils import common_utils
 
 
 class DataStructure:
-    """Inherit this class to define your data structure"""
+    """Inherit this class to define your data structure.
+    The way each key is saved depends on its 'extension' in the structure (see
+    mouffet.data.storage). By default, keys ending with '_df' are saved as feather files and
+    other keys are pickled. Lists of numpy arrays can use the 'arrays' extension to be saved
+    in a single buffer that can be memory-mapped, for instance:
+    {"spectrograms": {"type": "data", "extension": "arrays"}}
+    """
 
     STRUCTURE = {
         "data": {"type": "data", "data_type": []},
@@ -101,7 +101,6 @@ class Database(DatabaseOptions):
 
     def check_file_lists(self, db_types=None):
         print(f'Checking file lists for database {self["name"]}... ')
-        file_lists = {}
         if db_types is None:
             file_list_paths = self.paths["file_list"].values()
         else:
@@ -110,8 +109,7 @@ class Database(DatabaseOptions):
         # * Check if file lists are missing or need to be regenerated
         if not file_lists_exist or self.get("generate_file_lists", False):
             self.generate_file_lists()
-        else:
-            file_lists = self.load_file_lists(db_types)
+        file_lists = self.load_file_lists(db_types)
         return file_lists
 
     def get_data_file_lists(self, db_types=None):
@@ -1,10 +1,9 @@
-import pickle
 from pathlib import Path
 
-import feather
 import pandas as pd
 
-from ..utils import file_utils
+from ..utils import common_utils, file_utils
+from . import storage
 from .data_loader import DataLoader
 from .data_structure import DataStructure
 
@@ -120,6 +119,12 @@ class Dataset(DataStructure):
     def generate(self, file_list, missing, overwrite):
         loader_cls = self.LOADERS[self.database.get("loader", "default")]
         loader = loader_cls(self.get_structure_copy())
+        if self.database.incremental:
+            self.generate_incremental(loader, file_list, overwrite)
+            return
+        if self.database.chunk_size:
+            self.generate_by_chunks(loader, file_list, missing, overwrite)
+            return
         loader.generate_dataset(
             database=self.database,
             paths=self.paths,
@@ -130,11 +135,236 @@ class Dataset(DataStructure):
         )
         self.save(loader.data, missing)
 
+    def get_storage_options(self, key):
+        """Get the options used by the storage backend to save a key of the structure.
+
+        Args:
+            key (str): The key of the structure
+
+        Returns:
+            dict: The storage options
+        """
+        return {"compression": self.database.feather_compression}
+
+    def write_chunk(self, loader, missing, writers):
+        loader.finalize_dataset(missing)
+        for key, value in loader.data.items():
+            if not missing or key not in missing or not len(value):
+                continue
+            if key not in writers:
+                path = self.paths["save_dests"][self.db_type][key]
+                writers[key] = storage.get_storage(path).open_writer(
+                    path, **self.get_storage_options(key)
+                )
+            writers[key].write(value)
+        loader.data = self.get_structure_copy()
+
+    def generate_by_chunks(self, loader, file_list, missing, overwrite=False):
+        """Generate the dataset by chunks of files, as defined by the 'chunk_size' option.
+        After each chunk, the data is finalized and appended to the dataset files so that only
+        one chunk of data is kept in memory at a time. Note that this requires that
+        finalizing the dataset (see DataLoader.finalize_dataset()) can be done chunk by chunk.
+
+        Args:
+            loader (mouffet.data.DataLoader): The loader used to load the files
+            file_list (list): The files of the dataset
+            missing (list): The keys of the structure to generate
+            overwrite (bool, optional): Overwrite existing intermediate results.
+            Defaults to False.
+        """
+        chunk_size = self.database.chunk_size
+        writers = {}
+        n_files = 0
+        try:
+            for _ in loader.load_files(
+                self.database, self.paths, file_list, self.db_type, missing, overwrite
+            ):
+                n_files += 1
+                if n_files % chunk_size == 0:
+                    self.write_chunk(loader, missing, writers)
+            if n_files % chunk_size:
+                self.write_chunk(loader, missing, writers)
+        except BaseException:
+            for writer in writers.values():
+                writer.abort()
+            raise
+        for writer in writers.values():
+            writer.close()
+
+    def get_manifest_path(self, key):
+        return self.paths["save_dests"][self.db_type][key].with_suffix(".manifest.json")
+
+    def load_manifests(self, method):
+        """Load the manifests listing the source files used to generate each saved file
+        of the dataset, along with their fingerprint and the number of items they produced.
+
+        Args:
+            method (str): The fingerprint method used for the current generation
+
+        Returns:
+            dict: For each key, a dict with the source file paths as keys and their
+            fingerprint and position in the saved file as values. None if a saved file or its
+            manifest is missing or if the fingerprint method has changed.
+        """
+        res = {}
+        for key in self.structure.keys():
+            path = self.get_manifest_path(key)
+            if (
+                not path.exists()
+                or not self.paths["save_dests"][self.db_type][key].exists()
+            ):
+                return None
+            manifest = file_utils.load_json(path)
+            if manifest.get("fingerprint", "") != method:
+                return None
+            files = {}
+            start = 0
+            for entry in manifest.get("files", []):
+                end = start + entry["count"]
+                files[entry["path"]] = {
+                    "fingerprint": entry["fingerprint"],
+                    "start": start,
+                    "end": end,
+                }
+                start = end
+            res[key] = files
+        return res
+
+    @staticmethod
+    def slice_value(value, start, end):
+        if isinstance(value, pd.DataFrame):
+            return value.iloc[start:end]
+        if isinstance(value, (list, storage.ArrayList)):
+            return value[start:end]
+        raise ValueError(
+            "Incremental generation only supports lists and dataframes, got {}".format(
+                type(value)
+            )
+        )
+
+    def concat_values(self, key, values):
+        if not values:
+            return self.get_structure_copy()[key]
+        if all(isinstance(value, pd.DataFrame) for value in values):
+            return pd.concat(values, ignore_index=True)
+        if all(isinstance(value, list) for value in values):
+            return [item for value in values for item in value]
+        raise ValueError(
+            (
+                "Incremental generation only supports lists and dataframes. Check the values"
+                + " generated for key {}"
+            ).format(key)
+        )
+
+    def generate_incremental(self, loader, file_list, overwrite=False):
+        """Generate the dataset incrementally. Each saved file of the dataset is associated
+        with a manifest remembering which source files were used to generate it. Only
+        added or modified files are loaded, data from removed files is dropped and the results
+        are merged with the existing data, following the order of the file list.
+        Note that this requires that finalizing the dataset (see
+        DataLoader.finalize_dataset()) can be done file by file and that all keys of the
+        structure are either lists or dataframes.
+
+        Args:
+            loader (mouffet.data.DataLoader): The loader used to load the files
+            file_list (list): The files of the dataset
+            overwrite (bool, optional): Overwrite existing intermediate results.
+            Defaults to False.
+        """
+        keys = list(self.structure.keys())
+        method = self.database.file_fingerprint
+        file_list = [str(file_path) for file_path in file_list]
+        fingerprints = {}
+        for file_path in file_list:
+            try:
+                fingerprints[file_path] = file_utils.get_file_fingerprint(
+                    file_path, method
+                )
+            except FileNotFoundError:
+                fingerprints[file_path] = None
+
+        previous = self.load_manifests(method)
+        if previous is None:
+            print("No valid manifest found, generating the full dataset")
+            previous = {key: {} for key in keys}
+        unchanged = {
+            file_path
+            for file_path, fingerprint in fingerprints.items()
+            if fingerprint is not None
+            and all(
+                previous[key].get(file_path, {}).get("fingerprint", None) == fingerprint
+                for key in keys
+            )
+        }
+        to_load = [file_path for file_path in file_list if file_path not in unchanged]
+        if not to_load and all(list(previous[key].keys()) == file_list for key in keys):
+            print("Dataset {} is up to date".format(self.db_type))
+            return
+        print(
+            "{} files unchanged, {} files to load, {} files removed".format(
+                len(unchanged),
+                len(to_load),
+                len(set(previous[keys[0]]) - set(file_list)),
+            )
+        )
+
+        segments = {}
+        for file_path, file_data in loader.iter_file_data(
+            self.database, self.paths, to_load, self.db_type, keys, overwrite
+        ):
+            if file_data is not None:
+                segments[str(file_path)] = loader.finalize_file_data(file_data, keys)
+
+        old_data = {}
+        if unchanged:
+            old_data = {
+                key: loader.load_dataset_file(
+                    self.paths["save_dests"][self.db_type][key]
+                )
+                for key in keys
+            }
+
+        parts = {key: [] for key in keys}
+        entries = {key: [] for key in keys}
+        for file_path in file_list:
+            for key in keys:
+                if file_path in unchanged:
+                    pos = previous[key][file_path]
+                    part = self.slice_value(old_data[key], pos["start"], pos["end"])
+                elif file_path in segments:
+                    part = segments[file_path][key]
+                else:
+                    break
+                parts[key].append(part)
+                entries[key].append(
+                    {
+                        "path": file_path,
+                        "fingerprint": fingerprints[file_path],
+                        "count": len(part),
+                    }
+                )
+
+        data = {key: self.concat_values(key, parts[key]) for key in keys}
+        self.save(data, keys)
+        for key in keys:
+            save_dest = self.paths["save_dests"][self.db_type][key]
+            manifest_path = self.get_manifest_path(key)
+            if len(data[key]):
+                file_utils.save_json(
+                    manifest_path, {"fingerprint": method, "files": entries[key]}
+                )
+            else:
+                # * Empty values are not saved, remove stale files
+                for path in [save_dest, manifest_path]:
+                    if path.exists():
+                        path.unlink()
+
     def save(self, data, missing=None):
-        """_summary_
+        """Save the keys of the structure listed in missing. Empty values are not saved.
 
         Args:
-            data (_type_): _description_
+            data (dict): The data to save
+            missing (list, optional): The keys to save. Defaults to None.
         """
         if data:
             for key, value in data.items():
@@ -146,25 +376,9 @@ class Dataset(DataStructure):
                         if not value:
                             continue
                     path = self.paths["save_dests"][self.db_type][key]
-                    if path.suffix == ".pkl":
-                        with open(
-                            file_utils.ensure_path_exists(path, is_file=True), "wb"
-                        ) as f:
-                            pickle.dump(value, f, -1)
-                            print("Saved file: ", path)
-                    elif path.suffix == ".feather":
-                        if isinstance(value, pd.DataFrame):
-                            value = value.reset_index(drop=True)
-                            feather.write_dataframe(value, path)
-                        else:
-                            raise (
-                                ValueError(
-                                    (
-                                        "Trying to write feather data from a source that"
-                                        + " is not a dataframe for key {}"
-                                    ).format(key)
-                                )
-                            )
+                    storage.get_storage(path).write(
+                        path, value, **self.get_storage_options(key)
+                    )
 
     def get_loader(self):
         loader_cls = self.LOADERS[self.database.get("loader", "default")]
@@ -172,10 +386,13 @@ class Dataset(DataStructure):
         return loader
 
     def load(self, load_opts=None):
-        """_summary_
+        """Load the dataset files. If the 'lazy' option is set in load_opts, files are opened
+        without reading their content when the storage backend supports it, and the data is
+        only read when accessed. See mouffet.data.DataLoader.get_read_options() for all
+        supported options.
 
         Args:
-            load_opts (_type_, optional): _description_. Defaults to None.
+            load_opts (dict, optional): The loading options. Defaults to None.
         """
         loader = self.get_loader()
         loader.load_dataset(self.paths, self.db_type, load_opts)
@@ -196,6 +413,27 @@ class Dataset(DataStructure):
                 res.append(key)
         return res
 
+    def get_fingerprint(self, file_types=None, method="stat"):
+        """Get a fingerprint of the files of the dataset to detect if they have changed.
+        See mouffet.utils.file.get_file_fingerprint().
+
+        Args:
+            file_types (list, optional): Only use the files of these types. Defaults to None,
+            meaning all types.
+            method (str, optional): "stat" or "hash". Defaults to "stat".
+
+        Returns:
+            str: The fingerprint of the dataset
+        """
+        fingerprints = {}
+        for key, path in self.paths["save_dests"][self.db_type].items():
+            if file_types and key not in file_types:
+                continue
+            fingerprints[key] = (
+                file_utils.get_file_fingerprint(path, method) if path.exists() else ""
+            )
+        return common_utils.get_options_fingerprint(fingerprints)
+
     def summarize(self):
         """_summary_
 
@@ -0,0 +1,160 @@
+import multiprocessing
+import queue
+import threading
+import traceback
+
+_ITEM = 0
+_END = 1
+_ERROR = 2
+
+
+def _put(items, value, stop):
+    while not stop.is_set():
+        try:
+            items.put(value, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce(iterable, transform, items, stop, in_process):
+    try:
+        for item in iterable:
+            if transform is not None:
+                item = transform(item)
+            if not _put(items, (_ITEM, item), stop):
+                return
+        _put(items, (_END, None), stop)
+    except Exception as error:  # pylint: disable=broad-except
+        if in_process:
+            # * Exceptions are not always picklable, send the traceback instead
+            error = RuntimeError(
+                "Error in prefetching process:\n" + traceback.format_exc()
+            )
+        _put(items, (_ERROR, error), stop)
+
+
+class Prefetcher:
+    """Iterates over an iterable in a background producer so that loading and preprocessing
+    the next items overlaps with the processing of the current item by the consumer.
+    Up to `depth` items are prepared in advance. Works with any iterable: lists of files,
+    datasets, generators yielding batches, etc.
+
+    With the "thread" executor, the producer is a thread. This is suited for I/O bound
+    loading or preprocessing that releases the GIL (numpy, most deep learning frameworks).
+    With the "process" executor, the producer is a separate process. Items are then pickled
+    to be sent to the consumer and the iterable must be inherited by the process (fork start
+    method) or picklable.
+
+    Iterating a second time over a Prefetcher iterates again over the iterable.
+
+    Example:
+        for batch in Prefetcher(batches, depth=4, transform=preprocess):
+            model.predict(batch)
+    """
+
+    EXECUTORS = ["thread", "process"]
+
+    def __init__(self, iterable, depth=2, executor="thread", transform=None):
+        """
+        Args:
+            iterable (iterable): The items to iterate over
+            depth (int, optional): The maximum number of items prepared in advance.
+            Defaults to 2.
+            executor (str, optional): Either "thread" or "process". Defaults to "thread".
+            transform (callable, optional): Function applied to each item by the producer.
+            Defaults to None.
+
+        Raises:
+            ValueError: If the executor is not supported
+        """
+        if executor not in self.EXECUTORS:
+            raise ValueError(
+                "Executor {} is not supported. Use either 'thread' or 'process'".format(
+                    executor
+                )
+            )
+        self.iterable = iterable
+        self.depth = max(depth, 1)
+        self.executor = executor
+        self.transform = transform
+        self._producer = None
+        self._items = None
+        self._stop = None
+
+    def __len__(self):
+        return len(self.iterable)
+
+    def start(self):
+        if self.executor == "process":
+            ctx = multiprocessing.get_context(
+                "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            )
+            self._items = ctx.Queue(maxsize=self.depth)
+            self._stop = ctx.Event()
+            self._producer = ctx.Process(
+                target=_produce,
+                args=(self.iterable, self.transform, self._items, self._stop, True),
+                daemon=True,
+            )
+        else:
+            self._items = queue.Queue(maxsize=self.depth)
+            self._stop = threading.Event()
+            self._producer = threading.Thread(
+                target=_produce,
+                args=(self.iterable, self.transform, self._items, self._stop, False),
+                daemon=True,
+            )
+        self._producer.start()
+
+    def get(self):
+        while True:
+            try:
+                return self._items.get(timeout=0.1)
+            except queue.Empty:
+                if not self._producer.is_alive():
+                    break
+        # * The producer has stopped, get the last items it may have sent
+        try:
+            return self._items.get(timeout=1)
+        except queue.Empty as error:
+            raise RuntimeError("Prefetching producer stopped unexpectedly") from error
+
+    def close(self):
+        """Stop the producer. Called automatically at the end of the iteration"""
+        if self._producer is None:
+            return
+        self._stop.set()
+        # * Empty the queue so that the producer is not blocked when sending items
+        try:
+            while True:
+                self._items.get_nowait()
+        except queue.Empty:
+            pass
+        self._producer.join(timeout=1)
+        if self.executor == "process":
+            if self._producer.is_alive():
+                self._producer.terminate()
+            self._items.close()
+        self._producer = None
+
+    def __iter__(self):
+        self.close()
+        self.start()
+        try:
+            while True:
+                kind, value = self.get()
+                if kind == _END:
+                    break
+                if kind == _ERROR:
+                    raise value
+                yield value
+        finally:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
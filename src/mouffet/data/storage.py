@@ -0,0 +1,476 @@
+import contextlib
+import copy
+import os
+import pickle
+from collections.abc import Sequence
+from pathlib import Path
+
+import feather
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pa_dataset
+from pyarrow import feather as pa_feather
+
+from ..utils import common_utils, file_utils
+
+
+class StorageWriter:
+    """Writer used to save a dataset file chunk by chunk. Data is written to a temporary file
+    that replaces the destination only when the writer is closed, so an interrupted
+    generation never leaves a partial file behind.
+    """
+
+    def __init__(self, storage, path, **kwargs):
+        self.storage = storage
+        self.path = Path(path)
+        self.options = kwargs
+        self.tmp_path = self.path.with_name("." + self.path.name + ".tmp")
+        self.n_chunks = 0
+
+    def write(self, value):
+        file_utils.ensure_path_exists(self.tmp_path, is_file=True)
+        self.write_chunk(value)
+        self.n_chunks += 1
+
+    def write_chunk(self, value):
+        raise NotImplementedError("write_chunk not implemented for this class")
+
+    def finish(self):
+        """Called before the temporary file is moved to its destination"""
+
+    def close(self):
+        self.finish()
+        if self.n_chunks:
+            os.replace(self.tmp_path, self.path)
+            print("Saved file: ", self.path)
+
+    def abort(self):
+        self.finish()
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+
+
+class PickleWriter(StorageWriter):
+    """Appends each chunk as a new pickle frame. Frames are concatenated when loaded"""
+
+    def write_chunk(self, value):
+        with open(self.tmp_path, "ab") as f:
+            pickle.dump(value, f, -1)
+
+
+class ArrowWriter(StorageWriter):
+    """Writes each chunk as Arrow record batches in an Arrow IPC (feather) file.
+    The types of the columns can change between chunks, for instance a column that only
+    contains None in the first chunk. The schema of the file is then promoted to a type
+    compatible with all chunks and the chunks already written are converted to it.
+    """
+
+    def __init__(self, storage, path, **kwargs):
+        super().__init__(storage, path, **kwargs)
+        self.writer = None
+        self.schema = None
+
+    def open(self, path, schema):
+        self.schema = schema
+        self.writer = pa.ipc.new_file(
+            str(path),
+            schema,
+            options=pa.ipc.IpcWriteOptions(
+                compression=self.storage.get_compression(
+                    self.options.get("compression", "lz4")
+                )
+            ),
+        )
+
+    def unify_schema(self, schema):
+        try:
+            return pa.unify_schemas([self.schema, schema], promote_options="permissive")
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as error:
+            columns = [
+                field.name
+                for field in schema
+                if field.name in self.schema.names
+                and not field.type.equals(self.schema.field(field.name).type)
+            ]
+            raise ValueError(
+                (
+                    "Cannot write chunk to {}: the types of columns {} are not "
+                    + "compatible with previous chunks ({})"
+                ).format(self.path, columns, error)
+            ) from error
+
+    def conform(self, table, schema):
+        """Convert a table to a schema. Missing columns are filled with nulls"""
+        columns = []
+        for field in schema:
+            if field.name not in table.column_names:
+                columns.append(pa.nulls(len(table), field.type))
+                continue
+            try:
+                columns.append(table.column(field.name).cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error:
+                raise ValueError(
+                    (
+                        "Cannot write chunk to {}: column '{}' cannot be converted "
+                        + "to {} ({})"
+                    ).format(self.path, field.name, field.type, error)
+                ) from error
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    def rewrite(self, schema):
+        """Convert the chunks already written to a new schema"""
+        self.writer.close()
+        old_path = self.tmp_path.with_name(self.tmp_path.name + ".old")
+        os.replace(self.tmp_path, old_path)
+        try:
+            self.open(self.tmp_path, schema)
+            with pa.memory_map(str(old_path)) as source:
+                reader = pa.ipc.open_file(source)
+                for idx in range(reader.num_record_batches):
+                    batch = pa.Table.from_batches([reader.get_batch(idx)])
+                    self.writer.write_table(self.conform(batch, schema))
+        finally:
+            old_path.unlink()
+
+    def write_chunk(self, value):
+        table = self.storage.to_table(value)
+        if self.writer is None:
+            self.open(self.tmp_path, table.schema)
+        elif not table.schema.equals(self.schema):
+            schema = self.unify_schema(table.schema)
+            if not schema.equals(self.schema):
+                common_utils.print_info(
+                    "Column types changed in {}, converting previous chunks".format(
+                        self.path
+                    )
+                )
+                self.rewrite(schema)
+            table = self.conform(table, self.schema)
+        self.writer.write_table(table)
+
+    def finish(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class Storage:
+    """Base class describing how a key of a dataset is saved on disk and loaded back.
+    Options not supported by a backend are ignored.
+    """
+
+    WRITER = None
+
+    @staticmethod
+    def get_compression(compression):
+        if not compression or compression == "uncompressed":
+            return None
+        return compression if pa.Codec.is_available(compression) else None
+
+    def read(self, path, **kwargs):
+        raise NotImplementedError("read not implemented for this class")
+
+    def write(self, path, value, **kwargs):
+        raise NotImplementedError("write not implemented for this class")
+
+    def open_writer(self, path, **kwargs):
+        return self.WRITER(self, path, **kwargs)  # pylint: disable=not-callable
+
+
+class PickleStorage(Storage):
+
+    WRITER = PickleWriter
+
+    def read(self, path, lazy=False, **kwargs):
+        if lazy:
+            common_utils.print_warning(
+                "Pickle files cannot be loaded lazily, loading {} entirely".format(path)
+            )
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+            # * Files written by chunks contain several pickle frames
+            while True:
+                try:
+                    value += pickle.load(f)
+                except EOFError:
+                    break
+        return value
+
+    def write(self, path, value, **kwargs):
+        with open(file_utils.ensure_path_exists(path, is_file=True), "wb") as f:
+            pickle.dump(value, f, -1)
+        print("Saved file: ", path)
+
+
+class FeatherStorage(Storage):
+
+    WRITER = ArrowWriter
+
+    @staticmethod
+    def to_table(value, schema=None):
+        if not isinstance(value, pd.DataFrame):
+            raise ValueError(
+                "Trying to write feather data from a source that is not a dataframe"
+            )
+        return pa.Table.from_pandas(value, schema=schema, preserve_index=False)
+
+    @staticmethod
+    def get_filter_expression(filters):
+        """Convert a dict of filters into a pyarrow expression. Keys are column names and
+        values are either a single value or a list of accepted values.
+
+        Args:
+            filters (dict): The filters
+
+        Returns:
+            pyarrow.compute.Expression: The filter expression
+        """
+        expression = None
+        for column, values in filters.items():
+            if isinstance(values, (list, tuple, set)):
+                tmp = pc.field(column).isin(list(values))
+            else:
+                tmp = pc.field(column) == values
+            expression = tmp if expression is None else expression & tmp
+        return expression
+
+    def read(
+        self,
+        path,
+        memory_map=False,
+        as_arrow=False,
+        columns=None,
+        filters=None,
+        lazy=False,
+        **kwargs
+    ):
+        """Read a feather file.
+
+        Args:
+            path (str or pathlib.Path): The path of the file
+            memory_map (bool, optional): Memory map the file instead of reading it. Data is
+            then only read from disk when accessed. Note that this avoids copies only for
+            uncompressed files (see the 'feather_compression' option). Defaults to False.
+            as_arrow (bool, optional): Return a pyarrow.Table instead of a pandas
+            dataframe. Defaults to False.
+            columns (list, optional): Only read these columns. Defaults to None.
+            filters (dict, optional): Only read rows matching these filters.
+            See get_filter_expression(). Defaults to None.
+            lazy (bool, optional): Only read data when accessed. Implies memory_map.
+            Defaults to False.
+
+        Returns:
+            pandas.DataFrame or pyarrow.Table: The content of the file
+        """
+        if columns or filters:
+            # * Use a dataset to only read and decode the requested data
+            table = pa_dataset.dataset(str(path), format="feather").to_table(
+                columns=columns,
+                filter=self.get_filter_expression(filters) if filters else None,
+            )
+        elif memory_map or as_arrow or lazy:
+            table = pa_feather.read_table(str(path), memory_map=memory_map or lazy)
+        else:
+            return feather.read_dataframe(str(path))
+        if as_arrow:
+            return table
+        # * Avoid consolidating columns to allow zero-copy conversion where possible
+        return table.to_pandas(split_blocks=True)
+
+    def write(self, path, value, compression="lz4", **kwargs):
+        pa_feather.write_feather(
+            self.to_table(value),
+            str(file_utils.ensure_path_exists(path, is_file=True)),
+            compression=self.get_compression(compression) or "uncompressed",
+        )
+        print("Saved file: ", path)
+
+
+class ArrowChunkReader:
+    """Reads the record batches of an Arrow IPC (feather) file one at a time as pandas
+    dataframes. The file is memory-mapped and only the current batch is loaded in memory.
+    The reader can be iterated several times.
+    """
+
+    def __init__(self, path, transform=None, keep_open=False):
+        """
+        Args:
+            path (str or pathlib.Path): The path of the file
+            transform (callable, optional): Function applied to each dataframe.
+            Defaults to None.
+            keep_open (bool, optional): Memory map the file when the reader is created
+            instead of each time it is read. The reader then remains valid if the file is
+            removed or replaced. Defaults to False.
+        """
+        self.path = Path(path)
+        self.transform = transform
+        self.source = pa.memory_map(str(self.path)) if keep_open else None
+
+    def open(self):
+        if self.source is not None:
+            return contextlib.nullcontext(self.source)
+        return pa.memory_map(str(self.path))
+
+    def with_transform(self, transform):
+        """Get a reader of the same file applying another transform
+
+        Args:
+            transform (callable): Function applied to each dataframe
+
+        Returns:
+            ArrowChunkReader: The new reader
+        """
+        reader = copy.copy(self)
+        reader.transform = transform
+        return reader
+
+    def __len__(self):
+        with self.open() as source:
+            return pa.ipc.open_file(source).num_record_batches
+
+    def __iter__(self):
+        with self.open() as source:
+            reader = pa.ipc.open_file(source)
+            for idx in range(reader.num_record_batches):
+                df = reader.get_batch(idx).to_pandas()
+                yield self.transform(df) if self.transform else df
+
+    def read_all(self):
+        """Read all batches in a single dataframe
+
+        Returns:
+            pandas.DataFrame: The content of the file
+        """
+        chunks = list(self)
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+    def read_dataframe(self):
+        """Read the whole file with the feather reader, without applying the transform.
+        Unlike read_all(), this also supports files saved with version 1 of feather.
+
+        Returns:
+            pandas.DataFrame: The content of the file
+        """
+        with self.open() as source:
+            return pa_feather.read_feather(source)
+
+
+class ArrayList(Sequence):
+    """Read-only list of numpy arrays backed by an Arrow table saved by ArrayStorage.
+    Items are only converted to numpy arrays when accessed, without copy when possible.
+    The last cache_size accessed items are kept in memory.
+    """
+
+    def __init__(self, table, cache_size=0):
+        self.table = table
+        self.values = table.column("values")
+        self.shapes = table.column("shape")
+        self.cache = common_utils.LRUCache(cache_size)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("ArrayList index out of range")
+        item = self.cache.get(idx, None)
+        if item is None:
+            values = self.values[idx].values.to_numpy(zero_copy_only=False)
+            item = values.reshape(self.shapes[idx].as_py())
+            self.cache[idx] = item
+        return item
+
+
+class ArrayStorage(Storage):
+    """Stores a list of numpy arrays of possibly different shapes as a single Arrow buffer
+    with the values of all arrays. Items are delimited by the offsets of an Arrow list
+    column and their shapes saved in a second column. Files can be memory-mapped and items
+    accessed individually without loading the whole list.
+    All arrays should have the same number type.
+    """
+
+    WRITER = ArrowWriter
+
+    @staticmethod
+    def get_compression(compression):
+        # * Always save arrays uncompressed so they can be accessed without copy
+        return None
+
+    @staticmethod
+    def to_table(value, schema=None):
+        arrays = [np.asarray(item) for item in value]
+        offsets = np.cumsum([0] + [item.size for item in arrays], dtype=np.int64)
+        if arrays:
+            flat = np.concatenate([item.ravel() for item in arrays])
+        else:
+            flat = np.array([], dtype=np.float32)
+        table = pa.table(
+            {
+                "values": pa.LargeListArray.from_arrays(
+                    pa.array(offsets), pa.array(flat)
+                ),
+                "shape": pa.array(
+                    [list(item.shape) for item in arrays], type=pa.list_(pa.int64())
+                ),
+            }
+        )
+        if schema is not None:
+            table = table.cast(schema)
+        return table
+
+    def read(self, path, memory_map=False, lazy=False, cache_size=0, **kwargs):
+        """Read a list of arrays.
+
+        Args:
+            path (str or pathlib.Path): The path of the file
+            memory_map (bool, optional): Memory map the file instead of reading it.
+            Defaults to False.
+            lazy (bool, optional): Only read items when accessed. Implies memory_map.
+            Defaults to False.
+            cache_size (int, optional): The number of items to keep in memory once accessed.
+            Defaults to 0.
+
+        Returns:
+            ArrayList: The list of arrays
+        """
+        if memory_map or lazy:
+            source = pa.memory_map(str(path))
+        else:
+            source = pa.OSFile(str(path))
+        return ArrayList(pa.ipc.open_file(source).read_all(), cache_size)
+
+    def write(self, path, value, **kwargs):
+        table = self.to_table(value)
+        with pa.ipc.new_file(
+            str(file_utils.ensure_path_exists(path, is_file=True)), table.schema
+        ) as writer:
+            writer.write_table(table)
+        print("Saved file: ", path)
+
+
+STORAGES = {
+    "arrays": ArrayStorage(),
+    "feather": FeatherStorage(),
+    "pkl": PickleStorage(),
+}
+
+
+def get_storage(path):
+    """Get the storage backend associated with the extension of a file.
+    Defaults to pickle for unknown extensions.
+
+    Args:
+        path (str or pathlib.Path): The path of the file
+
+    Returns:
+        Storage: The storage backend
+    """
+    return STORAGES.get(Path(path).suffix[1:], STORAGES["pkl"])
@@ -47,3 +47,4 @@ EVALUATORS = _Evaluators()
 
 
 from .evaluation_handler import EvaluationHandler
+from .pr_curve_store import PRCurveStore
@@ -1,17 +1,51 @@
+import inspect
+import json
+import pickle
 import time
 import traceback
 from abc import abstractmethod
 from datetime import datetime
+from functools import partial
 from itertools import product
 from pathlib import Path
 
 import feather
 import pandas as pd
 
+from ..data import storage
 from ..options import ModelOptions
 from ..plotting import plot
+from ..plotting.deferred import DeferredPlot, render_plots
 from ..utils import ModelHandler, common_utils, file_utils
 from . import EVALUATORS
+from .pr_curve_store import PRCurveStore
+
+_WORKER_HANDLER = None
+
+
+def _init_evaluation_worker(handler):
+    global _WORKER_HANDLER  # pylint: disable=global-statement
+    _WORKER_HANDLER = handler
+
+
+def _evaluate_scenario_group(scenarios):
+    return _WORKER_HANDLER.evaluate_scenario_group(scenarios)
+
+
+_WORKER_RESULTS = None
+
+
+def _init_plots_worker(handler, results):
+    # * Results are inherited by the workers once instead of being sent with each plot
+    global _WORKER_HANDLER, _WORKER_RESULTS  # pylint: disable=global-statement
+    _WORKER_HANDLER = handler
+    _WORKER_RESULTS = results
+
+
+def _save_plots(plot_type, key, path):
+    return _WORKER_HANDLER.save_plots(
+        _WORKER_RESULTS[plot_type + "plots"][key], key, path
+    )
 
 
 class EvaluationHandler(ModelHandler):
@@ -45,11 +79,16 @@ class EvaluationHandler(ModelHandler):
 
     PREDICTIONS_STATS_FILE_NAME = "predictions_stats.csv"
     PREDICTIONS_STATS_DUPLICATE_COLUMNS = ["database", "model_id"]
+    PREDICTIONS_INDEX_FILE_NAME = "predictions_index.json"
+    # * Evaluator options that do not change the evaluation results
+    EVALUATION_CACHE_IGNORE_KEYS = ["scenario_info"]
 
     # EVALUATORS = {}
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.shared_predictions = None
+        self.checked_datasets = set()
         # plot.set_plotting_package(options=self.opts)  # pylint: disable=no-member
 
     @abstractmethod
@@ -61,6 +100,11 @@ class EvaluationHandler(ModelHandler):
         This function also logs general information about the classification that is stored in the
         infos dict
 
+        Alternatively, this function can be a generator that yields predictions by chunks (e.g.
+        for each file or batch) as pandas Dataframes with the same columns, and returns the
+        infos dict. Chunks are then written to the predictions file as they are produced so
+        that all predictions never need to be kept in memory.
+
         Args:
             model (_type_): _description_
             database (_type_): _description_
@@ -85,57 +129,293 @@ class EvaluationHandler(ModelHandler):
         return Path(preds_dir)
 
     def get_predictions_file_name(self, model_opts, database):
-        return (
+        file_name = (
             database.name
             + "_"
             + model_opts.model_id
             + "_v"
             + str(model_opts.load_version)
-            + ".feather"
         )
+        if self.opts.get("predictions_cache", False):
+            file_name += "_" + self.get_predictions_key(model_opts, database)[:16]
+        return file_name + ".feather"
+
+    def get_predictions_key(self, model_opts, database):
+        """Get a key identifying the predictions of a model on a database. The key depends on
+        the files of the model version (e.g. its weights), the options of the database and
+        the files of the test dataset, so that predictions are computed again if any of
+        them changes. Only the files of the types listed in 'predictions_dataset_file_types'
+        are used if this option is set. Missing files of these types are generated first so
+        that the key does not change once they are. Files are compared using the method
+        defined by the 'predictions_fingerprint' option
+        (see mouffet.utils.file.get_file_fingerprint()).
+
+        Args:
+            model_opts (mouffet.options.ModelOptions): The options of the model
+            database (mouffet.data.Database): The database to predict
+
+        Returns:
+            str: The key of the predictions
+        """
+        method = self.opts.get("predictions_fingerprint", "stat")
+        file_types = self.opts.get("predictions_dataset_file_types", None)
+        self.check_test_dataset(database, file_types)
+        model_path = (
+            Path(self.get_option("model_dir", model_opts))
+            / model_opts.model_id
+            / str(model_opts.load_version)
+        )
+        dataset = database.DATASET(database=database, db_type="test")
+        return common_utils.get_options_fingerprint(
+            {
+                "model": (
+                    file_utils.get_dir_fingerprint(model_path, method)
+                    if model_path.exists()
+                    else ""
+                ),
+                "database": database.opts,
+                "dataset": dataset.get_fingerprint(file_types, method),
+            }
+        )
+
+    def update_predictions_index(self, preds_dir, pred_file):
+        """Record the use of a predictions file in the index of the predictions directory.
+        If the 'predictions_cache_max_size' option is set, the least recently used
+        predictions files are removed until the total size of the indexed files is below
+        this size (in MB).
+
+        Args:
+            preds_dir (pathlib.Path): The predictions directory
+            pred_file (pathlib.Path): The predictions file used
+        """
+        index_path = preds_dir / self.PREDICTIONS_INDEX_FILE_NAME
+        with file_utils.FileLock(self.get_lock_path(index_path)):
+            index = file_utils.load_json(index_path)
+            index[pred_file.name] = {
+                "size": pred_file.stat().st_size,
+                "last_access": time.time(),
+            }
+            max_size = self.opts.get("predictions_cache_max_size", 0) * 1024 * 1024
+            if max_size:
+                total = sum(entry["size"] for entry in index.values())
+                for file_name, entry in sorted(
+                    index.items(), key=lambda item: item[1]["last_access"]
+                ):
+                    if total <= max_size:
+                        break
+                    if file_name == pred_file.name or not self.evict_predictions(
+                        preds_dir / file_name
+                    ):
+                        continue
+                    total -= entry["size"]
+                    index.pop(file_name)
+            with file_utils.atomic_open(index_path, "w") as f:
+                json.dump(index, f)
+
+    def evict_predictions(self, pred_file):
+        """Remove a predictions file from the predictions cache. Files being read or
+        computed by another process are kept (see compute_predictions()).
+
+        Args:
+            pred_file (pathlib.Path): The predictions file
+
+        Returns:
+            bool: True if the file was removed
+        """
+        try:
+            with file_utils.FileLock(self.get_lock_path(pred_file), timeout=0):
+                common_utils.print_info(
+                    "Removing predictions file {} from cache".format(pred_file.name)
+                )
+                pred_file.unlink(missing_ok=True)
+        except (TimeoutError, OSError):
+            return False
+        return True
 
     def on_get_predictions_end(self, preds, model_opts):
         return preds
 
-    def get_predictions(self, model_opts, database):
-        preds_dir = self.get_predictions_dir(model_opts, database)
-        file_name = self.get_predictions_file_name(model_opts, database)
-        pred_file = preds_dir / file_name
-        if not model_opts.get("repredict", False) and pred_file.exists():
-            preds = feather.read_dataframe(pred_file)
+    def write_predictions_chunks(self, chunks, pred_file):
+        """Write predictions yielded by a generator to the predictions file chunk by chunk.
+
+        Args:
+            chunks (generator): A generator yielding pandas Dataframes and returning a dict of
+            information about the predictions. Empty dataframes are skipped.
+            pred_file (pathlib.Path): The predictions file
+
+        Returns:
+            dict: The information returned by the generator
+        """
+        writer = storage.get_storage(pred_file).open_writer(
+            pred_file, compression=self.opts.get("predictions_compression", "lz4")
+        )
+        try:
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration as stop:
+                    infos = stop.value or {}
+                    break
+                # * Files without predictions can yield empty dataframes
+                if chunk is None or chunk.empty:
+                    continue
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        if not writer.n_chunks:
+            with file_utils.atomic_open(pred_file, "wb") as f:
+                feather.write_dataframe(pd.DataFrame(), f)
+        return infos
+
+    def make_predictions(self, model_opts, database, pred_file):
+        """Load the model, get its predictions for the database and save them in pred_file.
+
+        Args:
+            model_opts (mouffet.options.ModelOptions): The options of the model
+            database (mouffet.data.Database): The database to predict
+            pred_file (pathlib.Path): The predictions file
+
+        Returns:
+            pandas.DataFrame: The predictions or None if predictions were written by chunks
+        """
+        scenario_info = {}
+        model_opts.opts["data_config"] = self.opts["data_config"]
+        model_opts.opts["model_dir"] = self.get_option("model_dir", model_opts)
+        model_opts.opts["inference"] = True
+        common_utils.print_info("Loading model with options: " + str(model_opts))
+        model = self.load_model(model_opts)
+        res = self.predict_database(model, database, db_type="test")
+        if inspect.isgenerator(res):
+            preds = None
+            infos = self.write_predictions_chunks(res, pred_file)
         else:
-            # * Load predictions stats database
-            scenario_info = {}
-            preds_stats = None
-            preds_stats_dir = Path(self.get_option("predictions_dir", model_opts))
-            preds_stats_path = preds_stats_dir / self.PREDICTIONS_STATS_FILE_NAME
+            preds, infos = res
+        # * Release the model as soon as predictions are made
+        del model, res
+
+        if preds is not None:
+            # * Write to a temporary file first so that readers never see partial files
+            with file_utils.atomic_open(pred_file, "wb") as f:
+                feather.write_dataframe(preds, f)
+
+        # * save classification stats
+        scenario_info["date"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        scenario_info["model_id"] = model_opts.model_id
+        scenario_info.update(infos)
+        self.save_predictions_stats(model_opts, scenario_info)
+        return preds
+
+    def save_predictions_stats(self, model_opts, scenario_info):
+        """Add information about predictions to the predictions stats file. The file is
+        locked during the update so that several processes can share the same predictions
+        directory.
+
+        Args:
+            model_opts (mouffet.options.ModelOptions): The options of the model
+            scenario_info (dict): Information about the predictions
+        """
+        preds_stats_dir = Path(self.get_option("predictions_dir", model_opts))
+        preds_stats_path = preds_stats_dir / self.PREDICTIONS_STATS_FILE_NAME
+        df = pd.DataFrame([scenario_info])
+        with file_utils.FileLock(self.get_lock_path(preds_stats_path)):
             if preds_stats_path.exists():
-                preds_stats = pd.read_csv(preds_stats_path)
-            model_opts.opts["data_config"] = self.opts["data_config"]
-            model_opts.opts["model_dir"] = self.get_option("model_dir", model_opts)
-            model_opts.opts["inference"] = True
-            common_utils.print_info("Loading model with options: " + str(model_opts))
-            model = self.load_model(model_opts)
-            preds, infos = self.predict_database(model, database, db_type="test")
-
-            # * save classification stats
-            scenario_info["date"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            scenario_info["model_id"] = model_opts.model_id
-            scenario_info.update(infos)
-
-            df = pd.DataFrame([scenario_info])
-            if preds_stats is not None:
-                preds_stats = pd.concat([preds_stats, df])
+                preds_stats = pd.concat([pd.read_csv(preds_stats_path), df])
                 preds_stats = preds_stats.drop_duplicates(
-                    subset=self.PREDICTIONS_STATS_DUPLICATE_COLUMNS, keep="last"
+                    subset=[
+                        col
+                        for col in self.PREDICTIONS_STATS_DUPLICATE_COLUMNS
+                        if col in preds_stats.columns
+                    ],
+                    keep="last",
                 )
             else:
                 preds_stats = df
-            file_utils.ensure_path_exists(preds_stats_path, is_file=True)
-            preds_stats.to_csv(preds_stats_path, index=False)
+            with file_utils.atomic_open(preds_stats_path, "w") as f:
+                preds_stats.to_csv(f, index=False)
 
-            pred_file.parent.mkdir(parents=True, exist_ok=True)
-            feather.write_dataframe(preds, pred_file)
+    @staticmethod
+    def get_lock_path(path):
+        return path.with_name("." + path.name + ".lock")
+
+    def compute_predictions(self, model_opts, database, pred_file):
+        """Get the predictions of a model while holding a lock on the predictions file.
+        Predictions are read from pred_file if it exists and the 'repredict' option is not
+        set, or if another process has just computed them. Otherwise, they are computed with
+        make_predictions(). The file is opened while the lock is held, so it can still be
+        read if it is then removed from the predictions cache by another process
+        (see update_predictions_index()).
+
+        Args:
+            model_opts (mouffet.options.ModelOptions): The options of the model
+            database (mouffet.data.Database): The database to predict
+            pred_file (pathlib.Path): The predictions file
+
+        Returns:
+            tuple: The predictions as a pandas.DataFrame, or None if they were not loaded
+            yet, and a mouffet.data.storage.ArrowChunkReader of the opened file
+        """
+        wait_start = time.time()
+        repredict = model_opts.get("repredict", False)
+        with file_utils.FileLock(
+            self.get_lock_path(pred_file),
+            timeout=self.opts.get("predictions_lock_timeout", None),
+        ):
+            preds = None
+            if pred_file.exists() and (
+                not repredict or pred_file.stat().st_mtime >= wait_start
+            ):
+                if repredict:
+                    common_utils.print_info(
+                        "Using predictions computed by another process: {}".format(
+                            pred_file
+                        )
+                    )
+            else:
+                preds = self.make_predictions(model_opts, database, pred_file)
+            return preds, storage.ArrowChunkReader(pred_file, keep_open=True)
+
+    def get_predictions(self, model_opts, database, as_chunks=False):
+        """Get the predictions of a model on a database. Predictions are loaded from the
+        predictions directory if they exist and the 'repredict' option is not set. Otherwise,
+        the model is loaded and predict_database() is called.
+        When evaluating a group of scenarios (see evaluate_scenario_group()), predictions
+        are kept in memory and shared by all evaluators of the group.
+
+        Args:
+            model_opts (mouffet.options.ModelOptions): The options of the model
+            database (mouffet.data.Database): The database to predict
+            as_chunks (bool, optional): Return a reader of the predictions file that loads
+            predictions chunk by chunk instead of loading all predictions.
+            Defaults to False.
+
+        Returns:
+            pandas.DataFrame or mouffet.data.storage.ArrowChunkReader: The predictions
+        """
+        preds_dir = self.get_predictions_dir(model_opts, database)
+        file_name = self.get_predictions_file_name(model_opts, database)
+        pred_file = preds_dir / file_name
+        key = str(pred_file)
+        if self.shared_predictions is not None and key in self.shared_predictions:
+            preds, reader = self.shared_predictions[key]
+        else:
+            preds, reader = self.compute_predictions(model_opts, database, pred_file)
+            if self.opts.get("predictions_cache", False):
+                self.update_predictions_index(preds_dir, pred_file)
+        if as_chunks:
+            if self.shared_predictions is not None:
+                self.shared_predictions.setdefault(key, (preds, reader))
+            return reader.with_transform(
+                partial(self.on_get_predictions_end, model_opts=model_opts)
+            )
+        if preds is None:
+            preds = reader.read_dataframe()
+        if self.shared_predictions is not None:
+            self.shared_predictions[key] = (preds, reader)
+            if isinstance(preds, pd.DataFrame):
+                # * Protect shared predictions against modifications of the columns
+                preds = preds.copy(deep=False)
         preds = self.on_get_predictions_end(preds, model_opts)
         return preds
 
@@ -152,18 +432,40 @@ class EvaluationHandler(ModelHandler):
                 )
         return res
 
+    def get_pr_curve_store(self):
+        """Get the store where PR curves are saved. PR curves are saved in the
+        'PR_curve_save_dir' directory of the evaluation directory. Scenarios are identified
+        by the 'PR_curve_key_columns' option. Curves saved in the 'PR_curve_save_file' file by
+        older versions are also loaded.
+
+        Returns:
+            mouffet.evaluation.PRCurveStore: The store
+        """
+        res_dir = Path(self.opts.get("evaluation_dir", "."))
+        return PRCurveStore(
+            res_dir / self.opts.get("PR_curve_save_dir", "PR_curves"),
+            key_columns=self.opts.get("PR_curve_key_columns", None),
+            legacy_file=res_dir
+            / self.opts.get("PR_curve_save_file", "PR_curves.feather"),
+        )
+
     def save_pr_curve_data(self, pr_df):
         print("saving_pr_curve data")
-        res_dir = Path(self.opts.get("evaluation_dir", "."))
-        pr_file = res_dir / self.opts.get("PR_curve_save_file", "PR_curves.feather")
-        if pr_file.exists():
-            pr_curves = pd.read_feather(pr_file)
-            res = pd.concat([pr_df, pr_curves]).drop_duplicates()
-        else:
-            res = pr_df
+        self.get_pr_curve_store().append(pr_df)
+
+    def load_pr_curve_data(self, columns=None, filters=None):
+        """Load all saved PR curves, keeping only the most recent results of each scenario.
+        See mouffet.evaluation.PRCurveStore.load()
+
+        Args:
+            columns (list, optional): Only load these columns. Defaults to None.
+            filters (dict, optional): Only load rows matching these filters.
+            Defaults to None.
 
-        res.reset_index(inplace=True, drop=True)
-        res.to_feather(pr_file)
+        Returns:
+            pandas.DataFrame: The PR curves
+        """
+        return self.get_pr_curve_store().load(columns=columns, filters=filters)
 
     def check_plotting_package(self, key):
         plt_pkg = self.opts.get("plot_options", {}).get(key, {}).get("package", "")
@@ -199,27 +501,75 @@ class EvaluationHandler(ModelHandler):
             if not pr_df.empty:
                 self.save_pr_curve_data(pr_df)
 
+            to_save = []
             for plot_type in ["", "global_"]:
                 plots = res.get(plot_type + "plots", {})
-                if plots:
-                    for key, values in plots.items():
-                        self.check_plotting_package(key)
-                        if values:
-                            plot_file_path = res_dir / (
-                                "_".join(
-                                    filter(
-                                        None,
-                                        [prefix, eval_id, "{}.pdf".format(key)],
-                                    )
+                for key, values in plots.items():
+                    if values:
+                        plot_file_path = res_dir / (
+                            "_".join(
+                                filter(
+                                    None,
+                                    [prefix, eval_id, "{}.pdf".format(key)],
                                 )
                             )
-                            plot.save_as_pdf(
-                                values,
-                                plot_file_path,
-                            )
-                            file_names[plot_type + "plot_" + key] = plot_file_path
+                        )
+                        to_save.append((plot_type, key, plot_file_path))
+            if to_save and self.opts.get("render_plots", True):
+                for plot_type, key, path in self.save_all_plots(res, to_save):
+                    file_names[plot_type + "plot_" + key] = path
         return file_names
 
+    def save_plots(self, values, key, path):
+        """Render plots and save them in a pdf file. Deferred plots are rendered one at a
+        time while the file is written so that only one figure is kept in memory.
+
+        Args:
+            values (list): Plots or deferred plots (see mouffet.plotting.DeferredPlot)
+            key (str): The name of the plots, used to select the plotting package
+            path (pathlib.Path): The pdf file
+        """
+        self.check_plotting_package(key)
+        plot.save_as_pdf(render_plots([values]), path)  # pylint: disable=no-member
+
+    def save_all_plots(self, results, to_save):
+        """Save plots in pdf files. If the 'plots_n_jobs' option is greater than 1, each
+        file is rendered in a separate process.
+
+        Args:
+            results (dict): The evaluation results
+            to_save (list): Tuples of (plot_type, key, path) describing the plots to save.
+            plot_type is either "" or "global_".
+
+        Returns:
+            list: The tuples of to_save whose plots were saved
+        """
+        n_jobs = self.opts.get("plots_n_jobs", 1)
+        saved = []
+        if n_jobs > 1 and len(to_save) > 1:
+            with common_utils.get_executor(
+                n_jobs,
+                "process",
+                initializer=_init_plots_worker,
+                initargs=(self, results),
+            ) as executor:
+                futures = [executor.submit(_save_plots, *args) for args in to_save]
+                for args, future in zip(to_save, futures):
+                    try:
+                        future.result()
+                    except Exception:
+                        print(traceback.format_exc())
+                        common_utils.print_error(
+                            "Error saving plots {}".format(args[1])
+                        )
+                        continue
+                    saved.append(args)
+        else:
+            for plot_type, key, path in to_save:
+                self.save_plots(results[plot_type + "plots"][key], key, path)
+                saved.append((plot_type, key, path))
+        return saved
+
     def draw_global_plots(self, results):
 
         plts = {}
@@ -227,8 +577,7 @@ class EvaluationHandler(ModelHandler):
         for to_plot in plots:
             func_name = "plot_" + to_plot.strip()
             if hasattr(self, func_name) and callable(getattr(self, func_name)):
-                tmp = getattr(self, func_name)(results)
-                plts[to_plot] = tmp
+                plts[to_plot] = DeferredPlot(getattr(self, func_name), results)
         return plts
 
     def expand_scenarios(self, element_type):
@@ -345,20 +694,213 @@ class EvaluationHandler(ModelHandler):
             )
         return eval_result
 
+    def get_evaluation_cache_key(self, evaluator, database, model_opts, evaluator_opts):
+        """Get a key identifying the results of an evaluation. The key depends on the
+        model and its predictions (see get_predictions_key()), the files of the test dataset
+        required by the evaluator, the name and VERSION of the evaluator and its options.
+
+        Args:
+            evaluator (mouffet.evaluation.Evaluator): The evaluator
+            database (mouffet.data.Database): The evaluated database
+            model_opts (mouffet.options.ModelOptions): The options of the model
+            evaluator_opts (dict): The options of the evaluator
+
+        Returns:
+            str: The key of the evaluation results
+        """
+        dataset = database.DATASET(database=database, db_type="test")
+        return common_utils.get_options_fingerprint(
+            {
+                # * Predictions files are also identified by the model id and version
+                "model": [model_opts.model_id, str(model_opts.load_version)],
+                "predictions": self.get_predictions_key(model_opts, database),
+                "tags": dataset.get_fingerprint(
+                    evaluator.requires(evaluator_opts),
+                    self.opts.get("predictions_fingerprint", "stat"),
+                ),
+                "evaluator": [evaluator.NAME, evaluator.VERSION],
+                "options": evaluator_opts,
+            },
+            ignore_keys=self.EVALUATION_CACHE_IGNORE_KEYS,
+        )
+
+    def get_evaluation_cache_path(
+        self, evaluator, database, model_opts, evaluator_opts
+    ):
+        """Get the file where the results of an evaluation are cached when the
+        'evaluation_cache' option is set. Results are saved in the 'evaluation_cache_dir'
+        directory, which defaults to the evaluation_cache folder of the evaluation directory.
+
+        Returns:
+            pathlib.Path: The cache file or None if results should not be cached
+        """
+        if not self.opts.get("evaluation_cache", False) or evaluator_opts.get(
+            "filter_only", False
+        ):
+            return None
+        # * The key depends on the test dataset files, make sure they are generated first.
+        # * Files used by the predictions key are checked by get_predictions_key()
+        self.check_test_dataset(database, evaluator.requires(evaluator_opts))
+        cache_dir = self.opts.get("evaluation_cache_dir", "")
+        if not cache_dir:
+            cache_dir = Path(self.opts.get("evaluation_dir", ".")) / "evaluation_cache"
+        key = self.get_evaluation_cache_key(
+            evaluator, database, model_opts, evaluator_opts
+        )
+        return Path(cache_dir) / (key + ".pkl")
+
+    def load_cached_evaluation(self, cache_path, scenario_infos, scenario_opts):
+        """Load cached evaluation results. Information about the scenario is updated with
+        the current scenario since it can contain options that do not change the results,
+        such as the evaluation id.
+
+        Args:
+            cache_path (pathlib.Path): The cache file
+            scenario_infos (dict): Information about the scenario
+            scenario_opts (dict): The options of the scenario
+
+        Returns:
+            dict: The evaluation results or None if they are not cached
+        """
+        if (
+            cache_path is None
+            or self.opts.get("reevaluate", False)
+            or not cache_path.exists()
+        ):
+            return None
+        common_utils.print_info(
+            "Using cached evaluation of model {} on dataset {} with evaluator {}".format(
+                scenario_infos["model"],
+                scenario_infos["database"],
+                scenario_infos["evaluator"],
+            )
+        )
+        with open(cache_path, "rb") as f:
+            eval_result = pickle.load(f)
+        eval_result["stats"] = eval_result["stats"].assign(
+            **scenario_infos,
+            **{key: str(value) for key, value in scenario_opts.items()},
+        )
+        return eval_result
+
+    def save_cached_evaluation(self, cache_path, eval_result):
+        """Cache the stats of an evaluation, and its matches if the
+        'evaluation_cache_matches' option is set. Results containing plots or other outputs
+        are not cached since they could not be restored.
+
+        Args:
+            cache_path (pathlib.Path): The cache file
+            eval_result (dict): The evaluation results
+        """
+        if cache_path is None or not eval_result:
+            return
+        for key in set(eval_result.keys()) - {"stats", "matches"}:
+            value = eval_result[key]
+            if not value.empty if isinstance(value, pd.DataFrame) else value:
+                return
+        to_cache = {"stats": eval_result["stats"]}
+        if (
+            self.opts.get("evaluation_cache_matches", False)
+            and "matches" in eval_result
+        ):
+            to_cache["matches"] = eval_result["matches"]
+        with file_utils.atomic_open(
+            file_utils.ensure_path_exists(cache_path, is_file=True), "wb"
+        ) as f:
+            pickle.dump(to_cache, f, -1)
+
+    def check_test_dataset(self, database, file_types=None):
+        """Generate the missing files of the test dataset of a database. Each dataset is
+        only checked once per evaluation.
+
+        Args:
+            database (mouffet.data.Database): The database
+            file_types (list, optional): The file types to check. Defaults to None, meaning
+            all types.
+        """
+        key = (
+            common_utils.get_options_fingerprint(database.opts),
+            common_utils.get_options_fingerprint(file_types),
+        )
+        if key not in self.checked_datasets:
+            database.check_dataset("test", file_types=file_types)
+            self.checked_datasets.add(key)
+
     def get_evaluation_data(self, evaluator, database, model_opts, evaluator_opts):
         eval_requires = evaluator.requires(evaluator_opts)
-        database.check_dataset("test", file_types=eval_requires)
-        preds = self.get_predictions(model_opts, database)
+        self.check_test_dataset(database, eval_requires)
+        preds = self.get_predictions(
+            model_opts,
+            database,
+            as_chunks=evaluator.supports_chunks(evaluator_opts),
+        )
         if evaluator_opts.get("filter_only", False):
             tags = None
         else:
+            load_opts = evaluator.get_load_options(evaluator_opts)
+            load_opts["file_types"] = eval_requires
             tags = self.data_handler.load_dataset(
                 "test",
                 database,
-                load_opts={"file_types": eval_requires},
+                load_opts=load_opts,
             )
         return preds, tags
 
+    def get_scenario_database(self, db_opts, model_opts):
+        """Get the database of a scenario, updated with the 'databases_options' of the model
+
+        Args:
+            db_opts (dict): The options of the database
+            model_opts (mouffet.options.ModelOptions): The options of the model
+
+        Raises:
+            KeyError: If the database is not defined in the data configuration
+
+        Returns:
+            mouffet.data.Database: A copy of the database with the updated options
+        """
+        if "databases_options" in model_opts:
+            db_opts = common_utils.deep_dict_update(
+                db_opts, model_opts.databases_options, copy=True
+            )
+        return self.data_handler.duplicate_database(db_opts)
+
+    def check_scenarios_datasets(self, scenarios):
+        """Generate the missing files of the test datasets used by the scenarios. Called
+        before scenarios are evaluated in parallel so that workers do not generate the same
+        dataset files at the same time. Datasets checked here are not checked again by the
+        workers (see check_test_dataset()). Errors are reported when the scenario is
+        evaluated.
+
+        Args:
+            scenarios (list): The scenarios to evaluate
+        """
+        use_key = self.opts.get("predictions_cache", False) or self.opts.get(
+            "evaluation_cache", False
+        )
+        for db_opts, model_opts, evaluator_opts in scenarios:
+            try:
+                evaluator = EVALUATORS[evaluator_opts.get("type", None)]
+                if not evaluator or self.skip_database(db_opts["name"], evaluator_opts):
+                    continue
+                model_opts = self.add_global_options(ModelOptions(model_opts))
+                database = self.get_scenario_database(db_opts, model_opts)
+                if not database or not database.has_type("test"):
+                    continue
+                self.check_test_dataset(database, evaluator.requires(evaluator_opts))
+                if use_key:
+                    # * Files used by the predictions key (see get_predictions_key())
+                    self.check_test_dataset(
+                        database, self.opts.get("predictions_dataset_file_types", None)
+                    )
+            except Exception:
+                print(traceback.format_exc())
+                common_utils.print_error(
+                    "Error checking the test dataset of scenario {}".format(
+                        (db_opts, model_opts, evaluator_opts)
+                    )
+                )
+
     def evaluate_scenario(self, opts):
         try:
             db_opts, model_opts, evaluator_opts = opts
@@ -368,12 +910,9 @@ class EvaluationHandler(ModelHandler):
             model_opts = ModelOptions(model_opts)
             # * Add global option to model options for id resolution
             model_opts = self.add_global_options(model_opts)
-            if "databases_options" in model_opts:
-                common_utils.deep_dict_update(db_opts, model_opts.databases_options)
 
-            # * Duplicate database options
             try:
-                database = self.data_handler.duplicate_database(db_opts)
+                database = self.get_scenario_database(db_opts, model_opts)
             except KeyError:
                 common_utils.print_error(
                     (
@@ -401,13 +940,21 @@ class EvaluationHandler(ModelHandler):
                 evaluator = EVALUATORS[evaluator_opts.get("type", None)]
 
                 if evaluator:
-                    evaluation_data = self.get_evaluation_data(
+                    cache_path = self.get_evaluation_cache_path(
                         evaluator, database, model_opts, evaluator_opts
                     )
-
-                    eval_result = self.perform_evaluation(
-                        evaluator, evaluation_data, scenario_infos, scenario_opts
+                    eval_result = self.load_cached_evaluation(
+                        cache_path, scenario_infos, scenario_opts
                     )
+                    if eval_result is None:
+                        evaluation_data = self.get_evaluation_data(
+                            evaluator, database, model_opts, evaluator_opts
+                        )
+
+                        eval_result = self.perform_evaluation(
+                            evaluator, evaluation_data, scenario_infos, scenario_opts
+                        )
+                        self.save_cached_evaluation(cache_path, eval_result)
 
                     return eval_result
         except Exception:
@@ -417,11 +964,115 @@ class EvaluationHandler(ModelHandler):
             )
             return {}
 
+    def get_scenario_group_key(self, scenario):
+        db_opts, model_opts, _ = scenario
+        return common_utils.get_options_fingerprint([db_opts, model_opts])
+
+    def group_scenarios(self, scenarios):
+        """Group scenarios that share the same database and model, and thus the same
+        predictions and tags.
+
+        Args:
+            scenarios (list): The scenarios to group
+
+        Returns:
+            list: A list of groups, each group being a list of scenario indices
+        """
+        groups = {}
+        for idx, scenario in enumerate(scenarios):
+            groups.setdefault(self.get_scenario_group_key(scenario), []).append(idx)
+        return list(groups.values())
+
+    def evaluate_scenario_group(self, scenarios):
+        """Evaluate scenarios sharing the same database and model. Predictions are only
+        loaded or computed once and shared by all evaluators of the group.
+
+        Args:
+            scenarios (list): The scenarios to evaluate
+
+        Returns:
+            list: The results of each scenario
+        """
+        self.shared_predictions = {}
+        try:
+            return [self.evaluate_scenario(scenario) for scenario in scenarios]
+        finally:
+            self.shared_predictions = None
+
+    def evaluate_scenarios(self, scenarios):
+        """Evaluate all scenarios. Scenarios are evaluated by groups sharing the same
+        database and model. If the 'n_jobs' option is greater than 1, groups are evaluated in
+        parallel in separate processes, once the test datasets have been generated by the
+        main process.
+
+        Args:
+            scenarios (list): The scenarios to evaluate
+
+        Returns:
+            list: The results of each scenario, in the same order as scenarios
+        """
+        groups = self.group_scenarios(scenarios)
+        res = [{}] * len(scenarios)
+        n_jobs = self.opts.get("n_jobs", 1)
+        if n_jobs > 1 and len(groups) > 1:
+            self.check_scenarios_datasets(scenarios)
+            with common_utils.get_executor(
+                n_jobs,
+                "process",
+                initializer=_init_evaluation_worker,
+                initargs=(self,),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _evaluate_scenario_group, [scenarios[idx] for idx in group]
+                    )
+                    for group in groups
+                ]
+                for group, future in zip(groups, futures):
+                    try:
+                        group_res = future.result()
+                    except Exception:
+                        print(traceback.format_exc())
+                        common_utils.print_error(
+                            "Error evaluating scenarios {}".format(
+                                [scenarios[idx] for idx in group]
+                            )
+                        )
+                        continue
+                    for idx, scenario_res in zip(group, group_res):
+                        res[idx] = scenario_res or {}
+        else:
+            for group in groups:
+                group_res = self.evaluate_scenario_group(
+                    [scenarios[idx] for idx in group]
+                )
+                for idx, scenario_res in zip(group, group_res):
+                    res[idx] = scenario_res or {}
+        return res
+
     def evaluate(self):
         if not self.scenarios:
             common_utils.print_warning("No scenarios found for this evaluator")
             return []
-        res = [self.evaluate_scenario(scenario) for scenario in self.scenarios]
+        self.checked_datasets = set()
+        # * Optionally keep loaded test datasets in memory to share them between scenarios
+        dataset_cache = self.data_handler.dataset_cache
+        previous_size = dataset_cache.maxsize
+        dataset_cache.resize(self.opts.get("dataset_cache_size", previous_size))
+        # * Models loaded for predictions are kept in memory during the evaluation
+        model_cache = self.MODEL_CACHE
+        previous_model_limits = (model_cache.maxsize, model_cache.max_weight)
+        if "model_cache_size" in self.opts:
+            self.set_model_cache_size(
+                self.opts["model_cache_size"],
+                self.opts.get("model_cache_max_parameters", 0),
+            )
+        try:
+            res = self.evaluate_scenarios(self.scenarios)
+        finally:
+            self.data_handler.clear_cache()
+            dataset_cache.resize(previous_size)
+            self.set_model_cache_size(*previous_model_limits)
         results = self.consolidate_results(res)
         if self.opts.get("draw_global_plots", False):
             results["global_plots"] = self.draw_global_plots(results)
@@ -1,15 +1,37 @@
+import copy
 from abc import ABC, abstractmethod
 
+import numpy as np
 import pandas as pd
 
 from ..utils import common_utils
 from ..plotting import plot
+from ..plotting.deferred import DeferredPlot
+
+_WORKER_EVALUATOR = None
+_WORKER_DATA = None
+_WORKER_INFOS = None
+
+
+def _init_PR_curve_worker(evaluator, data, infos):
+    # * Data is inherited by the workers once instead of being sent with each scenario
+    global _WORKER_EVALUATOR, _WORKER_DATA, _WORKER_INFOS  # pylint: disable=global-statement
+    _WORKER_EVALUATOR = evaluator
+    _WORKER_DATA = data
+    _WORKER_INFOS = infos
+
+
+def _evaluate_PR_scenario(scenario):
+    return _WORKER_EVALUATOR.evaluate_scenario(_WORKER_DATA, scenario, _WORKER_INFOS)
 
 
 class Evaluator(ABC):
 
     NAME = ""
 
+    # * Increase when the results of the evaluator change to invalidate cached evaluations
+    VERSION = 1
+
     DEFAULT_PR_CURVE_OPTIONS = {
         "variable": "activity_threshold",
         "values": {"start": 0, "end": 1, "step": 0.05},
@@ -19,9 +41,29 @@ class Evaluator(ABC):
 
     REQUIRES = []
 
+    # * Set to True if the evaluator accepts predictions as an iterable of dataframes
+    # * (see mouffet.data.storage.ArrowChunkReader) instead of a single dataframe
+    SUPPORTS_CHUNKS = False
+
     def requires(self, options):
         return self.REQUIRES
 
+    def supports_chunks(self, options):
+        return self.SUPPORTS_CHUNKS
+
+    def get_load_options(self, options):
+        """Additional options used to load the data required by the evaluator, for instance to
+        only load some columns or rows of a dataframe using the 'columns' and 'filters' keys.
+        See mouffet.data.DataLoader.get_read_options() for details.
+
+        Args:
+            options (dict): The evaluator options
+
+        Returns:
+            dict: The loading options
+        """
+        return {}
+
     def run_evaluation(self, data, options, infos):
         res = {}
         if options.get("filter_only", False):
@@ -56,28 +98,164 @@ class Evaluator(ABC):
         # scenarios = common_utils.expand_options_dict(options)
         return scenarios
 
+    def get_PR_thresholds(self, options):
+        """Get the values of the PR curve when scenarios_PR_curve describes a single option.
+
+        Args:
+            options (dict): The evaluator options
+
+        Returns:
+            dict: The name of the option as key and a numpy array of its values. None if
+            several options are used to compute the PR curve.
+        """
+        pr_scenarios = options.get("scenarios_PR_curve", {})
+        if len(pr_scenarios) != 1:
+            return None
+        variable, values = next(iter(pr_scenarios.items()))
+        if isinstance(values, dict) and not ("start" in values and "end" in values):
+            return None
+        scenarios = common_utils.expand_options_dict(pr_scenarios)
+        return {variable: np.array([scenario[variable] for scenario in scenarios])}
+
+    def evaluate_thresholds(self, data, options, thresholds):
+        """Evaluate all values of a PR curve at once. Subclasses can implement this method to
+        avoid running a full evaluation for each value, for example by sorting the scores
+        once and counting matches for all thresholds with get_threshold_counts().
+        This method is only called when scenarios_PR_curve describes a single option.
+
+        Args:
+            data (tuple): The evaluation data
+            options (dict): The evaluator options
+            thresholds (dict): The name of the option as key and a numpy array of all its
+            values
+
+        Returns:
+            dict: A dict with the same keys as the results of evaluate(), containing the
+            results for all values. The "stats" key should contain one row per value.
+            Returns None by default, meaning that each value is evaluated separately.
+        """
+        return None
+
+    @staticmethod
+    def get_threshold_counts(scores, labels, thresholds, name="threshold"):
+        """Count true positives, false positives and false negatives for several thresholds
+        at once. An item is considered positive when its score is greater or equal to the
+        threshold. Scores are sorted once and counts are obtained from cumulative sums.
+
+        Args:
+            scores (array-like): The score of each item
+            labels (array-like): Whether each item is actually positive
+            thresholds (array-like): The thresholds to evaluate
+            name (str, optional): The name of the threshold column.
+            Defaults to "threshold".
+
+        Returns:
+            pandas.DataFrame: A dataframe with one row per threshold with the true_positives,
+            false_positives, false_negatives, precision and recall columns. Precision is 0
+            when no item is positive.
+        """
+        scores = np.asarray(scores)
+        thresholds = np.asarray(thresholds)
+        order = np.argsort(scores, kind="stable")
+        sorted_scores = scores[order]
+        sorted_labels = np.asarray(labels, dtype=bool)[order]
+        # * Number of positive labels among items with a score greater or equal to each item
+        positives_above = np.append(np.cumsum(sorted_labels[::-1])[::-1], 0)
+        idx = np.searchsorted(sorted_scores, thresholds, side="left")
+        n_positives = len(scores) - idx
+        tp = positives_above[idx]
+        fp = n_positives - tp
+        fn = sorted_labels.sum() - tp
+        precision = np.divide(
+            tp, n_positives, out=np.zeros(len(tp)), where=n_positives > 0
+        )
+        recall = np.divide(tp, tp + fn, out=np.zeros(len(tp)), where=(tp + fn) > 0)
+        return pd.DataFrame(
+            {
+                name: thresholds,
+                "true_positives": tp,
+                "false_positives": fp,
+                "false_negatives": fn,
+                "precision": precision,
+                "recall": recall,
+            }
+        )
+
+    def evaluate_PR_scenarios(self, data, scenarios, infos, options):
+        """Evaluate each scenario of a PR curve. If the 'PR_curve_n_jobs' option is greater
+        than 1, scenarios are evaluated in a process pool. The data is passed once to each
+        worker when it starts and results are returned in the order of the scenarios.
+
+        Args:
+            data (tuple): The evaluation data
+            scenarios (list): The options of each scenario
+            infos (dict): Information about the evaluation
+            options (dict): The evaluator options
+
+        Returns:
+            list: The results of each scenario
+        """
+        n_jobs = options.get("PR_curve_n_jobs", 1)
+        if n_jobs > 1 and len(scenarios) > 1:
+            with common_utils.get_executor(
+                n_jobs,
+                "process",
+                initializer=_init_PR_curve_worker,
+                initargs=(self, data, infos),
+            ) as executor:
+                return list(
+                    executor.map(
+                        _evaluate_PR_scenario,
+                        scenarios,
+                        chunksize=max(len(scenarios) // (n_jobs * 4), 1),
+                    )
+                )
+        return [self.evaluate_scenario(data, scenario, infos) for scenario in scenarios]
+
     def get_PR_curve(self, data, options, infos):
-        scenarios = self.get_PR_scenarios(options)
-        tmp = []
-        for scenario in scenarios:
-            tmp.append(self.evaluate_scenario(data, scenario, infos))
-
-        res = common_utils.listdict2dictlist(tmp)
-        res["matches"] = pd.concat(res["matches"])
-        res["stats"] = pd.concat(res["stats"])
-        res["plots"] = common_utils.listdict2dictlist(res.get("plots", []))
+        res = None
+        thresholds = self.get_PR_thresholds(options)
+        if thresholds is not None:
+            res = self.evaluate_thresholds(data, options, thresholds)
+            if res is not None:
+                res.setdefault("plots", {})
+        if res is None:
+            scenarios = self.get_PR_scenarios(options)
+            tmp = self.evaluate_PR_scenarios(data, scenarios, infos, options)
+
+            res = common_utils.listdict2dictlist(tmp)
+            res["matches"] = pd.concat(res["matches"])
+            res["stats"] = pd.concat(res["stats"])
+            res["plots"] = common_utils.listdict2dictlist(res.get("plots", []))
         if options.get("draw_plots", True):
             res = plot.plot_PR_curve(res, options)  # pylint: disable=no-member
         return res
 
     def draw_plots(self, data, options, infos):
+        """Get the plots listed in the 'plots' option. Plots are deferred: the functions of
+        the PLOTS attribute are only called when the plots are saved.
+        See mouffet.plotting.deferred.DeferredPlot
+        Options are copied since they can be modified by later scenarios. The evaluation
+        data is kept in memory until the plots are saved. When scenarios are evaluated in
+        parallel (see the 'n_jobs' option), it is also sent back from the workers with the
+        results.
+
+        Args:
+            data (tuple): The evaluation data
+            options (dict): The evaluator options
+            infos (dict): Information about the evaluation
+
+        Returns:
+            dict: The deferred plots with the name of the plot as key
+        """
         res = {}
         plots = options.get("plots", [])
         for to_plot in plots:
             func = self.PLOTS.get(to_plot, None)
             if func is not None:
-                tmp = func(data, options, infos)
-                res[to_plot] = tmp
+                res[to_plot] = DeferredPlot(
+                    func, data, copy.deepcopy(options), dict(infos)
+                )
 
             # func_name = "plot_" + to_plot.strip()
             # if hasattr(self, func_name) and callable(getattr(self, func_name)):
@@ -0,0 +1,153 @@
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from ..data import storage
+from ..utils import common_utils, file_utils
+
+
+class PRCurveStore:
+    """Append-only store for PR curve results. Each call to append() writes a new feather
+    fragment in the store directory and records it in a manifest, so saving only costs the
+    size of the new results. Duplicates are removed when the store is queried with load():
+    rows with the same scenario key are only kept from the most recent fragment.
+
+    A single feather file created by older versions can be given as legacy_file. It is then
+    considered as the oldest fragment of the store.
+    """
+
+    MANIFEST_FILE_NAME = "manifest.jsonl"
+    FRAGMENT_COLUMN = "_fragment"
+
+    def __init__(self, root, key_columns=None, legacy_file=None):
+        """
+        Args:
+            root (str or pathlib.Path): The directory of the store
+            key_columns (list, optional): The columns identifying a scenario. Defaults to None,
+            meaning that only identical rows are considered as duplicates.
+            legacy_file (str or pathlib.Path, optional): Path to a single file containing
+            PR curves saved by older versions. Defaults to None.
+        """
+        self.root = Path(root)
+        self.key_columns = key_columns
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+
+    @property
+    def manifest_path(self):
+        return self.root / self.MANIFEST_FILE_NAME
+
+    def get_fragments(self):
+        """Get the fragments of the store from the oldest to the most recent
+
+        Returns:
+            list: The paths of the fragments
+        """
+        fragments = []
+        if self.legacy_file and self.legacy_file.exists():
+            fragments.append(self.legacy_file)
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        fragment = self.root / json.loads(line)["file"]
+                        if fragment.exists():
+                            fragments.append(fragment)
+        return fragments
+
+    def append(self, df):
+        """Save new PR curve results in a new fragment
+
+        Args:
+            df (pandas.DataFrame): The results to save
+
+        Returns:
+            pathlib.Path: The path of the new fragment
+        """
+        cur_time = datetime.now()
+        file_name = "{}_{}.feather".format(
+            cur_time.strftime("%Y%m%d%H%M%S"), uuid.uuid4().hex[:8]
+        )
+        path = self.root / file_name
+        with file_utils.atomic_open(path, "wb") as f:
+            df.reset_index(drop=True).to_feather(f)
+        # * Only record the fragment once it is completely written
+        with open(self.manifest_path, "a") as f:
+            f.write(
+                json.dumps(
+                    {
+                        "file": file_name,
+                        "rows": len(df),
+                        "date": cur_time.strftime("%d/%m/%Y %H:%M:%S"),
+                    }
+                )
+                + "\n"
+            )
+        return path
+
+    @staticmethod
+    def get_fragment_columns(path, columns):
+        with pa.memory_map(str(path)) as source:
+            names = pa.ipc.open_file(source).schema.names
+        return [column for column in columns if column in names]
+
+    def load(self, columns=None, filters=None):
+        """Load the PR curves saved in the store, removing duplicates
+
+        Args:
+            columns (list, optional): Only load these columns. Key columns are always loaded.
+            Defaults to None.
+            filters (dict, optional): Only load rows matching these filters. See
+            mouffet.data.storage.FeatherStorage.get_filter_expression(). Defaults to None.
+
+        Returns:
+            pandas.DataFrame: The PR curves
+        """
+        if columns and self.key_columns:
+            columns = list(dict.fromkeys(list(columns) + list(self.key_columns)))
+        dfs = []
+        for idx, fragment in enumerate(self.get_fragments()):
+            read_columns = None
+            if columns:
+                read_columns = self.get_fragment_columns(fragment, columns)
+            df = storage.get_storage(fragment).read(
+                fragment, columns=read_columns, filters=filters
+            )
+            dfs.append(df.assign(**{self.FRAGMENT_COLUMN: idx}))
+        if not dfs:
+            common_utils.print_warning("No PR curves found in {}".format(self.root))
+            return pd.DataFrame()
+        # * Most recent fragments first so that their rows are kept
+        res = pd.concat(dfs[::-1], ignore_index=True)
+        subset = self.key_columns
+        if not subset:
+            subset = [col for col in res.columns if col != self.FRAGMENT_COLUMN]
+        res = res.drop_duplicates(subset=subset, keep="first")
+        return (
+            res.sort_values(self.FRAGMENT_COLUMN, kind="stable")
+            .drop(columns=self.FRAGMENT_COLUMN)
+            .reset_index(drop=True)
+        )
+
+    def compact(self):
+        """Replace all fragments by a single deduplicated fragment"""
+        fragments = self.get_fragments()
+        if len(fragments) < 2:
+            return
+        df = self.load()
+        tmp_manifest = self.manifest_path.with_name("." + self.MANIFEST_FILE_NAME)
+        if self.manifest_path.exists():
+            self.manifest_path.replace(tmp_manifest)
+        try:
+            self.append(df)
+        except BaseException:
+            if tmp_manifest.exists():
+                tmp_manifest.replace(self.manifest_path)
+            raise
+        if tmp_manifest.exists():
+            tmp_manifest.unlink()
+        for fragment in fragments:
+            fragment.unlink()
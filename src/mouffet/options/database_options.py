@@ -6,10 +6,16 @@ class DatabaseOptions(Options):
     DB_TYPES = ["test", "training", "validation"]
 
     DEFAULT_VALUES = {
+        "chunk_size": 0,
         "class_type": "",
         "db_types": DB_TYPES,
         "data_extensions": [""],
+        "executor": "process",
+        "feather_compression": "lz4",
+        "file_fingerprint": "stat",
         "generate_file_lists": False,
+        "incremental": False,
+        "n_workers": 1,
         "overwrite": False,
         "recursive": False,
         "save_intermediates": False,
@@ -17,6 +17,10 @@ class Options:
     def __getstate__(self):
         return self.opts
 
+    def __setstate__(self, state):
+        # * Needed to unpickle options as __getattr__ relies on the opts attribute
+        self.__init__(state)
+
     def __getattr__(self, name):
         value = self.opts.get(name, self.DEFAULT_VALUES.get(name, None))
         if value is None:
@@ -1,3 +1,5 @@
+from .deferred import DeferredPlot, render_plots
+
 # from importlib import import_module
 # import sys
 
@@ -0,0 +1,50 @@
+class DeferredPlot:
+    """Lightweight description of a plot: a function and the arguments used to draw it.
+    The function is only called when the plot is rendered, usually when results are saved,
+    so that figures do not need to be kept in memory during the evaluation.
+    The function can return a single figure or a list of figures.
+
+    Arguments are kept by reference: copy those that can be modified before the plot is
+    rendered. They are kept in memory until then and are pickled if the deferred plot is
+    sent to another process, for instance when scenarios are evaluated in parallel.
+
+    Example:
+        plots["scores"] = DeferredPlot(plot_scores, predictions, options)
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        """
+        Args:
+            func (callable): The function drawing the plot
+            *args: Positional arguments of func
+            **kwargs: Keyword arguments of func
+        """
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def render(self):
+        return self.func(*self.args, **self.kwargs)
+
+    def __repr__(self):
+        return "DeferredPlot({})".format(getattr(self.func, "__name__", self.func))
+
+
+def render_plots(plots):
+    """Render plots one at a time. Deferred plots are only drawn when the next plot is
+    requested, and lists of plots are flattened, so that plots can be streamed to a file
+    page by page.
+
+    Args:
+        plots (iterable): Plots, deferred plots or lists of them
+
+    Yields:
+        object: The rendered plots
+    """
+    for value in plots:
+        if isinstance(value, DeferredPlot):
+            value = value.render()
+        if isinstance(value, (list, tuple)):
+            yield from render_plots(value)
+        elif value is not None:
+            yield value
@@ -1,3 +1,5 @@
+import copy
+
 from plotnine import (
     aes,
     element_text,
@@ -9,15 +11,16 @@ from plotnine import (
     save_as_pdf_pages,
 )
 
+from .deferred import DeferredPlot
+
 
 def save_as_pdf(values, path):
+    # * Plots can be a generator so that they are drawn and saved one page at a time
     save_as_pdf_pages(values, path)
 
 
-def plot_PR_curve(results, options):
-    PR_df = results["stats"]
-
-    plt = (
+def get_PR_curve_plot(PR_df, options):
+    return (
         ggplot(
             data=PR_df,
             mapping=aes(
@@ -45,5 +48,13 @@ def plot_PR_curve(results, options):
         )
     )
 
-    results["plots"].update({"PR_curve": plt})
+
+def plot_PR_curve(results, options):
+    results["plots"].update(
+        {
+            "PR_curve": DeferredPlot(
+                get_PR_curve_plot, results["stats"], copy.deepcopy(options)
+            )
+        }
+    )
     return results
@@ -2,8 +2,6 @@ import ast
 import shutil
 from pathlib import Path
 
-import pandas as pd
-
 from mouffet import common_utils, config_utils, file_utils
 
 from .parser import RunArgumentParser
@@ -95,12 +93,11 @@ class RunHandler:
         if "data_config" not in evaluation_config:
             evaluation_config["data_config"] = str(opts_path / self.args.data_config)
 
-        models_stats_path = Path(model_dir) / config_utils.MODELS_STATS_FILE_NAME
-        models_stats = None
-        if models_stats_path.exists():
-            models_stats = pd.read_csv(models_stats_path).drop_duplicates(
-                "opts", keep="last"
-            )
+        models_stats = config_utils.load_models_stats(
+            model_dir,
+            trainer.opts.get("fingerprint_ignore_keys", None),
+            trainer.opts.get("models_stats_backend", "csv"),
+        )
         if models_stats is not None:
             models = [ast.literal_eval(row.opts) for row in models_stats.itertuples()]
             models = self.clean_model_options(models)
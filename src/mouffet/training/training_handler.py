@@ -1,13 +1,32 @@
 import copy
+import os
 import time
 import traceback
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime
 
-import pandas as pd
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
 
 from ..data import DB_TYPE_TRAINING, DB_TYPE_VALIDATION
 from ..options import ModelOptions
-from ..utils import ModelHandler, common_utils, file_utils, config_utils
+from ..utils import ModelHandler, common_utils, model_registry
+
+_WORKER_HANDLER = None
+
+
+def _init_training_worker(handler, n_threads):
+    global _WORKER_HANDLER  # pylint: disable=global-statement
+    _WORKER_HANDLER = handler
+    if n_threads:
+        handler.set_worker_threads(n_threads)
+
+
+def _train_scenario(scenario):
+    return _WORKER_HANDLER.train_scenario(scenario)
 
 
 class TrainingHandler(ModelHandler):
@@ -17,6 +36,14 @@ class TrainingHandler(ModelHandler):
         DB_TYPE_VALIDATION,
     ]
 
+    THREADS_ENV_VARIABLES = [
+        "OMP_NUM_THREADS",
+        "MKL_NUM_THREADS",
+        "OPENBLAS_NUM_THREADS",
+        "NUMEXPR_NUM_THREADS",
+        "VECLIB_MAXIMUM_THREADS",
+    ]
+
     def check_repeat(self, scenarios):
         res = []
         for scenario in scenarios:
@@ -65,13 +92,27 @@ class TrainingHandler(ModelHandler):
                 db_opts.append(db_opt)
         return db_opts
 
-    def is_already_trained(self, scenario, models_stats, model_opts):
+    def get_model_registry(self, model_opts):
+        """Get the registry where trained models are saved. The backend is defined by the
+        'models_stats_backend' option. Models are identified by a fingerprint of their
+        options, ignoring the options listed in 'fingerprint_ignore_keys'.
+
+        Args:
+            model_opts (mouffet.options.ModelOptions): The model options
+
+        Returns:
+            mouffet.utils.model_registry.ModelRegistry: The registry
+        """
+        return model_registry.get_model_registry(
+            model_opts.model_dir,
+            model_opts.get("models_stats_backend", "csv"),
+            model_opts.get("fingerprint_ignore_keys", None),
+        )
+
+    def is_already_trained(self, scenario, registry, model_opts):
         if model_opts.get("skip_trained", False):
             print("Checking if already trained")
-            tmp = models_stats.loc[
-                models_stats.opts == str(scenario)  # pylint: disable=no-member
-            ]
-            if not tmp.empty:
+            if registry.is_trained(scenario):
                 return True
         return False
 
@@ -79,22 +120,15 @@ class TrainingHandler(ModelHandler):
         try:
             scenario_info = {}
             start = time.time()
-            models_stats = None
             common_utils.print_title(
                 "Training scenario with options: {}".format(scenario)
             )
             model_opts = ModelOptions(copy.deepcopy(scenario))
 
             # * Load model stats database
-            models_stats_path = (
-                model_opts.model_dir / config_utils.MODELS_STATS_FILE_NAME
-            )
-            if models_stats_path.exists():
-                models_stats = pd.read_csv(models_stats_path)
+            registry = self.get_model_registry(model_opts)
             # * Check if model has already been trained
-            if models_stats is not None and self.is_already_trained(
-                scenario, models_stats, model_opts
-            ):
+            if self.is_already_trained(scenario, registry, model_opts):
                 common_utils.print_info(
                     "Training for the model has already been completed and 'skip_trained' is True. Skipping scenario"
                 )
@@ -146,13 +180,7 @@ class TrainingHandler(ModelHandler):
             scenario_info["opts"] = str(scenario)
             scenario_info.update(train_stats)
 
-            df = pd.DataFrame([scenario_info])
-            if models_stats is not None:
-                models_stats = pd.concat([models_stats, df])
-            else:
-                models_stats = df
-            file_utils.ensure_path_exists(models_stats_path, is_file=True)
-            models_stats.to_csv(models_stats_path, index=False)
+            registry.add(scenario, scenario_info)
 
             return 1
 
@@ -162,10 +190,161 @@ class TrainingHandler(ModelHandler):
                 "Error training the model for scenario {}".format(scenario)
             )
 
+    def set_worker_threads(self, n_threads):
+        """Limit the number of threads used by a training worker. Sets the environment
+        variables read by OpenMP and BLAS libraries when they are loaded and, if threadpoolctl
+        is installed, limits the thread pools of libraries already loaded. Subclasses can
+        override this method to configure their deep learning framework
+        (e.g. tf.config.threading).
+
+        Args:
+            n_threads (int): The number of threads
+        """
+        for variable in self.THREADS_ENV_VARIABLES:
+            os.environ[variable] = str(n_threads)
+        if threadpool_limits is not None:
+            threadpool_limits(n_threads)
+
+    @contextmanager
+    def get_training_executor(self, n_jobs, n_threads):
+        """Create the process pool used to train scenarios. When the number of threads is
+        limited, workers are started with the "spawn" method and the threads environment
+        variables are set while the pool is used, so that libraries read the limit when
+        workers load them. Forked workers would inherit libraries already initialized by
+        the main process. The main script should then be protected by
+        `if __name__ == "__main__":`.
+
+        Args:
+            n_jobs (int): The number of processes
+            n_threads (int): The number of threads of each process. 0 means no limit
+
+        Yields:
+            concurrent.futures.ProcessPoolExecutor: The executor
+        """
+        previous = {}
+        if n_threads:
+            for variable in self.THREADS_ENV_VARIABLES:
+                previous[variable] = os.environ.get(variable, None)
+                os.environ[variable] = str(n_threads)
+        try:
+            with common_utils.get_executor(
+                n_jobs,
+                "process",
+                initializer=_init_training_worker,
+                initargs=(self, n_threads),
+                start_method="spawn" if n_threads else None,
+            ) as executor:
+                yield executor
+        finally:
+            for variable, value in previous.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+
+    def train_scenario_isolated(self, scenario, n_threads):
+        """Train a scenario in its own process so that a crash does not affect others"""
+        try:
+            with self.get_training_executor(1, n_threads) as executor:
+                return executor.submit(_train_scenario, scenario).result()
+        except Exception:
+            print(traceback.format_exc())
+            common_utils.print_error(
+                "Error training the model for scenario {}".format(scenario)
+            )
+            return None
+
+    def check_scenarios_datasets(self, scenarios):
+        """Generate the missing datasets of all scenarios. Called before scenarios are
+        trained in parallel so that workers do not generate the same dataset files at the
+        same time. Datasets that are checked here are not checked again by the workers
+        (see mouffet.data.DataHandler.check_datasets()). Errors are reported when the
+        scenario is trained.
+
+        Args:
+            scenarios (list): The scenarios to train
+        """
+        for scenario in scenarios:
+            if not scenario.get("databases", None):
+                continue
+            try:
+                self.data_handler.check_datasets(
+                    databases=self.get_scenario_databases_options(scenario),
+                    db_types=self.DB_TYPES,
+                )
+            except Exception:
+                print(traceback.format_exc())
+                common_utils.print_error(
+                    "Error checking the datasets of scenario {}".format(scenario)
+                )
+
+    def train_scenarios(self, scenarios):
+        """Train scenarios. If the 'n_jobs' option is greater than 1, up to n_jobs scenarios
+        are trained at the same time, each in its own process, once their datasets have been
+        generated by the main process. The number of threads used by each process can be
+        limited with the 'n_threads_per_job' option.
+        Results are returned in the order of the scenarios. Failed scenarios return None.
+        If a worker process crashes, the scenarios that were not completed are trained
+        again, each in its own process.
+
+        Args:
+            scenarios (list): The scenarios to train
+
+        Returns:
+            list: The results of train_scenario() for each scenario
+        """
+        n_jobs = self.opts.get("n_jobs", 1)
+        if n_jobs <= 1 or len(scenarios) <= 1:
+            return [self.train_scenario(scenario) for scenario in scenarios]
+        n_threads = self.opts.get("n_threads_per_job", 0)
+        self.check_scenarios_datasets(scenarios)
+        res = [None] * len(scenarios)
+        broken = []
+        with self.get_training_executor(n_jobs, n_threads) as executor:
+            futures = [
+                executor.submit(_train_scenario, scenario) for scenario in scenarios
+            ]
+            for idx, future in enumerate(futures):
+                try:
+                    res[idx] = future.result()
+                except BrokenProcessPool:
+                    broken.append(idx)
+                except Exception:
+                    print(traceback.format_exc())
+                    common_utils.print_error(
+                        "Error training the model for scenario {}".format(
+                            scenarios[idx]
+                        )
+                    )
+        if broken:
+            common_utils.print_warning(
+                (
+                    "A training process crashed. Training the {} remaining scenarios in "
+                    + "separate processes"
+                ).format(len(broken))
+            )
+        for idx in broken:
+            res[idx] = self.train_scenario_isolated(scenarios[idx], n_threads)
+        return res
+
     def train(self):
         if not self.data_handler:
             raise AttributeError(
                 "An instance of class DataHandler must be provided in data_handler"
                 + "attribute or at class initialisation"
             )
-        return [self.train_scenario(scenario) for scenario in self.scenarios]
+        # * Optionally share loaded and prepared datasets between scenarios with the same
+        # * data options
+        caches = {
+            "dataset_cache_size": self.data_handler.dataset_cache,
+            "prepared_dataset_cache_size": self.data_handler.prepared_dataset_cache,
+        }
+        previous = {key: cache.maxsize for key, cache in caches.items()}
+        for key, cache in caches.items():
+            cache.resize(self.opts.get(key, previous[key]))
+        try:
+            return self.train_scenarios(self.scenarios)
+        finally:
+            self.data_handler.clear_cache()
+            for key, cache in caches.items():
+                cache.resize(previous[key])
@@ -1,4 +1,5 @@
 from . import common as common_utils
 from . import file as file_utils
 from . import config as config_utils
+from . import model_registry
 from .model_handler import ModelHandler
@@ -1,4 +1,10 @@
+import hashlib
+import json
+import multiprocessing
+import threading
+from collections import OrderedDict
 from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from copy import deepcopy
 from itertools import product
 import re
@@ -230,3 +236,194 @@ def resolve_dict_pattern(opts, pattern_name, path_separator="--"):
 
 def any_in_list(elements, in_list):
     return len(set(elements).intersection(in_list)) > 0
+
+
+def get_canonical_options(opts, ignore_keys=None):
+    """Get a copy of options that can be serialized in a stable way: keys are converted to
+    strings and options objects are replaced by their dict.
+
+    Args:
+        opts (dict or mouffet.options.Options): The options
+        ignore_keys (list, optional): Keys removed at any level of the options.
+        Defaults to None.
+
+    Returns:
+        dict: The canonical options
+    """
+    ignore_keys = ignore_keys or []
+    if hasattr(opts, "opts") and isinstance(opts.opts, Mapping):
+        opts = opts.opts
+    if isinstance(opts, Mapping):
+        return {
+            str(key): get_canonical_options(value, ignore_keys)
+            for key, value in opts.items()
+            if key not in ignore_keys
+        }
+    if isinstance(opts, (list, tuple)):
+        return [get_canonical_options(value, ignore_keys) for value in opts]
+    return opts
+
+
+def get_options_fingerprint(opts, ignore_keys=None):
+    """Get a hash of options that does not depend on the order of the keys, to identify
+    identical options. Options that do not change the result, such as paths where results
+    are saved, can be ignored.
+
+    Args:
+        opts (dict or mouffet.options.Options): The options. Lists or tuples of options
+        are also accepted.
+        ignore_keys (list, optional): Keys ignored at any level of the options.
+        Defaults to None.
+
+    Returns:
+        str: The fingerprint of the options
+    """
+    canonical = json.dumps(
+        get_canonical_options(opts, ignore_keys), sort_keys=True, default=str
+    )
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def get_executor(
+    n_workers, executor="process", initializer=None, initargs=(), start_method=None
+):
+    """Create a pool executor to run tasks in parallel.
+
+    By default, process pools use the "fork" start method when available so that large
+    objects passed through `initargs` are inherited by the workers instead of being pickled.
+
+    Args:
+        n_workers (int): The maximum number of workers
+        executor (str, optional): Either "process" or "thread". Defaults to "process".
+        initializer (callable, optional): Function called at the start of each worker.
+            Defaults to None.
+        initargs (tuple, optional): Arguments passed to the initializer. Defaults to ().
+        start_method (str, optional): The start method of process pools, e.g. "spawn".
+            Defaults to None, meaning "fork" if available.
+
+    Raises:
+        ValueError: If the executor type is not supported
+
+    Returns:
+        concurrent.futures.Executor: The executor
+    """
+    if executor == "thread":
+        return ThreadPoolExecutor(
+            max_workers=n_workers, initializer=initializer, initargs=initargs
+        )
+    if executor == "process":
+        ctx = None
+        if start_method:
+            ctx = multiprocessing.get_context(start_method)
+        elif "fork" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("fork")
+        return ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=ctx,
+            initializer=initializer,
+            initargs=initargs,
+        )
+    raise ValueError(
+        "Executor {} is not supported. Use either 'process' or 'thread'".format(
+            executor
+        )
+    )
+
+
+class LRUCache:
+    """Thread-safe dict-like cache that keeps at most maxsize items. When full, the least
+    recently used items are discarded. A maxsize of 0 disables the cache.
+    Items can also be given a weight with set(). When max_weight is set, least recently used
+    items are discarded until the total weight of the cache fits within max_weight.
+    Only the limits of the cache are pickled, so a cache sent to another process is empty.
+    """
+
+    def __init__(self, maxsize=128, max_weight=0):
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weight = 0
+        self._items = OrderedDict()
+        self._weights = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        return {"maxsize": self.maxsize, "max_weight": self.max_weight}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._items[key]
+            self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, weight=0):
+        """Add an item to the cache
+
+        Args:
+            key (hashable): The key of the item
+            value (object): The item to cache
+            weight (int, optional): The weight of the item, e.g. its size. Items heavier
+            than max_weight are not cached. Defaults to 0.
+        """
+        with self._lock:
+            self.pop(key)
+            if self.maxsize <= 0 or (self.max_weight > 0 and weight > self.max_weight):
+                return
+            self._items[key] = value
+            self._weights[key] = weight
+            self.weight += weight
+            self.evict()
+
+    def evict(self):
+        """Discard least recently used items until the cache fits within its limits"""
+        with self._lock:
+            while self._items and (
+                len(self._items) > max(self.maxsize, 0)
+                or (self.max_weight > 0 and self.weight > self.max_weight)
+            ):
+                key, _ = self._items.popitem(last=False)
+                self.weight -= self._weights.pop(key)
+
+    def resize(self, maxsize, max_weight=None):
+        """Change the limits of the cache, discarding items if needed
+
+        Args:
+            maxsize (int): The maximum number of items
+            max_weight (int, optional): The maximum total weight. Defaults to None, meaning
+            that the current value is kept.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            if max_weight is not None:
+                self.max_weight = max_weight
+            self.evict()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self.weight -= self._weights.pop(key)
+            return self._items.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._weights.clear()
+            self.weight = 0
@@ -1,9 +1,6 @@
 import ast
-from pathlib import Path
-import pandas as pd
 from . import common_utils
-
-MODELS_STATS_FILE_NAME = "models_stats.csv"
+from .model_registry import MODELS_STATS_FILE_NAME, get_model_registry
 
 
 def get_option(x, opt_name):
@@ -57,6 +54,30 @@ def load_options(opts, updates=None, model_id=None):
 #     return config
 
 
+def load_models_stats(models_dir, ignore_keys=None, backend="csv"):
+    """Load information about the models trained in a directory, keeping only the last
+    model trained with the same options. Options are compared using their fingerprint
+    (see mouffet.utils.common.get_options_fingerprint()).
+
+    Args:
+        models_dir (str or pathlib.Path): The directory of the models
+        ignore_keys (list, optional): Options ignored when comparing models. Defaults to
+        None, meaning mouffet.utils.model_registry.FINGERPRINT_IGNORE_KEYS.
+        backend (str, optional): The registry where models are saved, as defined by the
+        'models_stats_backend' training option. Defaults to "csv".
+
+    Returns:
+        pandas.DataFrame: The information about the models. None if no model was found.
+    """
+    registry = get_model_registry(models_dir, backend, ignore_keys)
+    models_stats = registry.load()
+    if models_stats is not None:
+        models_stats = registry.add_fingerprints(models_stats).drop_duplicates(
+            "opts_hash", keep="last"
+        )
+    return models_stats
+
+
 def get_models_conf(config, updates=None):
     """Get configuration from multiple models based on model list saved at training
 
@@ -71,12 +92,9 @@ def get_models_conf(config, updates=None):
     append = config.get("add_models_from_list", False)
     if not models or append:
         models_dir = config.get("models_list_dir")
-        models_stats_path = Path(models_dir) / MODELS_STATS_FILE_NAME
-        models_stats = None
-        if models_stats_path.exists():
-            models_stats = pd.read_csv(models_stats_path).drop_duplicates(
-                "opts", keep="last"
-            )
+        backend = config.get("models_stats_backend", "csv")
+        if get_model_registry(models_dir, backend).exists():
+            models_stats = load_models_stats(models_dir, backend=backend)
             if models_stats is not None:
                 list_opts = config.get("models_list_options", {})
                 if updates:
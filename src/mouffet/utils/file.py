@@ -1,3 +1,9 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
 import yaml
@@ -100,3 +106,166 @@ def save_file_list(db_type, file_list, paths):
         for name in file_list:
             writer.writerow([name])
         print("Saved file list:", str(file_list_path))
+
+
+def get_file_fingerprint(path, method="stat"):
+    """Get a fingerprint of a file to detect if it has changed.
+
+    Args:
+        path (str or pathlib.Path): The path of the file
+        method (str, optional): "stat" to use the size and modification time of the file or
+        "hash" to use a hash of its content. Defaults to "stat".
+
+    Raises:
+        ValueError: If the method is not supported
+
+    Returns:
+        str: The fingerprint of the file
+    """
+    path = Path(path)
+    if method == "stat":
+        stat = path.stat()
+        return "{}-{}".format(stat.st_size, stat.st_mtime_ns)
+    if method == "hash":
+        file_hash = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+    raise ValueError("Fingerprint method {} is not supported".format(method))
+
+
+def get_dir_fingerprint(path, method="stat"):
+    """Get a fingerprint of all files contained in a directory and its subdirectories.
+    See get_file_fingerprint().
+
+    Args:
+        path (str or pathlib.Path): The path of the directory
+        method (str, optional): "stat" or "hash". Defaults to "stat".
+
+    Returns:
+        str: The fingerprint of the directory
+    """
+    path = Path(path)
+    dir_hash = hashlib.sha1()
+    for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+        dir_hash.update(
+            "{}:{};".format(
+                file_path.relative_to(path).as_posix(),
+                get_file_fingerprint(file_path, method),
+            ).encode("utf-8")
+        )
+    return dir_hash.hexdigest()
+
+
+def load_json(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    with open(ensure_path_exists(path, is_file=True), "w") as f:
+        json.dump(data, f)
+
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_open(path, mode="wb"):
+    """Open a temporary file that replaces the file at path when closed without errors.
+    Readers therefore never see a partially written file.
+
+    Args:
+        path (str or pathlib.Path): The path of the file to write
+        mode (str, optional): The opening mode. Defaults to "wb".
+
+    Yields:
+        file object: The opened temporary file
+    """
+    path = ensure_path_exists(path, is_file=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix="." + path.name + ".")
+    try:
+        # * Temporary files are only readable by their owner, use the usual permissions
+        os.chmod(tmp_path, path.stat().st_mode if path.exists() else 0o666 & ~_UMASK)
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FileLock:
+    """Inter-process lock based on an exclusive lock of a lock file. Can be used as a context
+    manager.
+    """
+
+    def __init__(self, path, timeout=None, poll_interval=0.1):
+        """
+        Args:
+            path (str or pathlib.Path): The path of the lock file
+            timeout (float, optional): Maximum number of seconds to wait for the lock. Wait
+            indefinitely if None. Defaults to None.
+            poll_interval (float, optional): Number of seconds between two attempts to get the
+            lock. Defaults to 0.1.
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._file = None
+
+    @staticmethod
+    def try_lock(f):
+        try:
+            if os.name == "nt":
+                import msvcrt  # pylint: disable=import-outside-toplevel
+
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl  # pylint: disable=import-outside-toplevel
+
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def unlock(f):
+        if os.name == "nt":
+            import msvcrt  # pylint: disable=import-outside-toplevel
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl  # pylint: disable=import-outside-toplevel
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def acquire(self):
+        f = open(ensure_path_exists(self.path, is_file=True), "a+")
+        start = time.time()
+        while not self.try_lock(f):
+            if self.timeout is not None and time.time() - start > self.timeout:
+                f.close()
+                raise TimeoutError("Could not acquire lock {}".format(self.path))
+            time.sleep(self.poll_interval)
+        self._file = f
+        return self
+
+    def release(self):
+        if self._file is not None:
+            self.unlock(self._file)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *args):
+        self.release()
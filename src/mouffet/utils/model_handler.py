@@ -13,6 +13,10 @@ class ModelHandler(ABC):
     DATA_HANDLER_CLASS = DataHandler
     NETWORK_OPTION_FILENAME = "network_opts.yaml"
 
+    # * Models loaded for inference, shared by all handlers. Disabled by default.
+    # * See set_model_cache_size()
+    MODEL_CACHE = common_utils.LRUCache(0)
+
     def __init__(
         self,
         opts=None,
@@ -61,6 +65,33 @@ class ModelHandler(ABC):
             raise Exception("A subclass of DataHandler must be provided")
         return dh
 
+    @classmethod
+    def set_model_cache_size(cls, maxsize, max_parameters=0):
+        """Set the limits of the cache of models loaded for inference. Least recently used
+        models are discarded when the limits are exceeded.
+
+        Args:
+            maxsize (int): Maximum number of models kept in memory. 0 disables the cache.
+            max_parameters (int, optional): Maximum total number of parameters of the cached
+            models, as returned by their n_parameters property. 0 means no limit.
+            Defaults to 0.
+        """
+        cls.MODEL_CACHE.resize(maxsize, max_parameters)
+
+    @classmethod
+    def clear_model_cache(cls):
+        """Discard all models kept in memory"""
+        cls.MODEL_CACHE.clear()
+
+    @staticmethod
+    def get_model_cache_key(model_dir, model_id, version, opts):
+        return (
+            str(model_dir),
+            model_id,
+            str(version),
+            common_utils.get_options_fingerprint(opts),
+        )
+
     @classmethod
     def load_model(cls, model_opts):
         """Load a model from the options provided by model_opts. Note: the options
@@ -68,6 +99,8 @@ class ModelHandler(ABC):
         model_opts (especially the paths). One exception is the "id" and "id_prefixes" options
         as the one from the old options will always be used to prevent any conflict if the user
         decides to define a new id for saving the evaluation results.
+        When loading a model for inference, the model is kept in memory and returned again
+        for the same options if the model cache is enabled (see set_model_cache_size()).
 
         Args:
             model_opts (mouffet.options.ModelOptions): The model options for the current scenario
@@ -108,8 +141,18 @@ class ModelHandler(ABC):
             opts.opts, model_opts.opts, except_keys=except_keys
         )
 
+        inference = model_opts.get("inference", False)
+        if inference:
+            key = cls.get_model_cache_key(model_dir, model_id, version, opts)
+            model = cls.MODEL_CACHE.get(key, None)
+            if model is not None:
+                common_utils.print_info("Using model from cache: " + model_id)
+                return model
+
         model = cls.get_model_instance(opts)
         model.init_model()
+        if inference:
+            cls.MODEL_CACHE.set(key, model, max(model.n_parameters, 0))
         return model
 
     @staticmethod
@@ -0,0 +1,275 @@
+import ast
+import json
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from . import common_utils, file_utils
+
+MODELS_STATS_FILE_NAME = "models_stats.csv"
+
+# * Options that do not change the trained model and are ignored when identifying a model
+FINGERPRINT_IGNORE_KEYS = ["model_dir", "log_dir"]
+
+
+class ModelRegistry:
+    """Base class of the registries keeping information about trained models. Each entry
+    is identified by a fingerprint of the options of the training scenario.
+    """
+
+    FILE_NAME = ""
+    LOCK_TIMEOUT = 600
+
+    def __init__(self, model_dir, ignore_keys=None):
+        """
+        Args:
+            model_dir (str or pathlib.Path): The directory of the models
+            ignore_keys (list, optional): Options ignored when identifying a model.
+            Defaults to None, meaning FINGERPRINT_IGNORE_KEYS.
+        """
+        self.model_dir = Path(model_dir)
+        self.ignore_keys = (
+            FINGERPRINT_IGNORE_KEYS if ignore_keys is None else ignore_keys
+        )
+
+    def get_fingerprint(self, scenario):
+        return common_utils.get_options_fingerprint(scenario, self.ignore_keys)
+
+    def add_fingerprints(self, models_stats):
+        """Add the fingerprint of the options of models registered without one
+
+        Args:
+            models_stats (pandas.DataFrame): Information about the models
+
+        Returns:
+            pandas.DataFrame: Information about the models with the opts_hash column
+        """
+        if "opts_hash" not in models_stats.columns:
+            models_stats["opts_hash"] = None
+        missing = models_stats.opts_hash.isna() | (models_stats.opts_hash == "")
+        if missing.any():
+            models_stats.loc[missing, "opts_hash"] = [
+                self.parse_fingerprint(opts) for opts in models_stats.opts[missing]
+            ]
+        return models_stats
+
+    def parse_fingerprint(self, opts):
+        try:
+            return self.get_fingerprint(ast.literal_eval(opts))
+        except (ValueError, SyntaxError):
+            # * Fall back to the string representation of the options
+            return common_utils.get_options_fingerprint(opts)
+
+    @property
+    def path(self):
+        return self.model_dir / self.FILE_NAME
+
+    @property
+    def lock(self):
+        return file_utils.FileLock(
+            self.path.with_name("." + self.path.name + ".lock"),
+            timeout=self.LOCK_TIMEOUT,
+        )
+
+    def exists(self):
+        return self.path.exists()
+
+    def is_trained(self, scenario):
+        """Check if a model has already been trained with these scenario options
+
+        Args:
+            scenario (dict): The options of the training scenario
+
+        Returns:
+            bool: True if the model has been trained
+        """
+        raise NotImplementedError("is_trained not implemented for this class")
+
+    def add(self, scenario, infos):
+        """Register a trained model
+
+        Args:
+            scenario (dict): The options of the training scenario
+            infos (dict): Information about the training, in the format of
+            models_stats.csv
+        """
+        raise NotImplementedError("add not implemented for this class")
+
+    def load(self):
+        """Load information about all trained models, in the format of models_stats.csv
+
+        Returns:
+            pandas.DataFrame: A dataframe with one row per trained model. None if no model
+            has been registered.
+        """
+        raise NotImplementedError("load not implemented for this class")
+
+    def export_csv(self, path=None):
+        """Export the registry in the format of models_stats.csv
+
+        Args:
+            path (str or pathlib.Path, optional): The destination file. Defaults to None,
+            meaning models_stats.csv in the model directory.
+
+        Returns:
+            pathlib.Path: The path of the exported file
+        """
+        path = Path(path) if path else self.model_dir / MODELS_STATS_FILE_NAME
+        df = self.load()
+        if df is None:
+            df = pd.DataFrame()
+        with file_utils.atomic_open(path, "w") as f:
+            df.to_csv(f, index=False)
+        return path
+
+
+class CSVModelRegistry(ModelRegistry):
+    """Registry saved in the models_stats.csv file. The whole file is read and rewritten
+    each time a model is added.
+    """
+
+    FILE_NAME = MODELS_STATS_FILE_NAME
+
+    def load(self):
+        if not self.exists():
+            return None
+        return pd.read_csv(self.path)
+
+    def is_trained(self, scenario):
+        models_stats = self.load()
+        if models_stats is None:
+            return False
+        models_stats = self.add_fingerprints(models_stats)
+        return (models_stats.opts_hash == self.get_fingerprint(scenario)).any()
+
+    def add(self, scenario, infos):
+        infos = dict(infos, opts_hash=self.get_fingerprint(scenario))
+        with self.lock:
+            models_stats = self.load()
+            df = pd.DataFrame([infos])
+            if models_stats is not None:
+                models_stats = pd.concat([models_stats, df])
+            else:
+                models_stats = df
+            with file_utils.atomic_open(self.path, "w") as f:
+                models_stats.to_csv(f, index=False)
+
+    def export_csv(self, path=None):
+        if path is None or Path(path) == self.path:
+            return self.path
+        return super().export_csv(path)
+
+
+class SQLiteModelRegistry(ModelRegistry):
+    """Registry saved in a SQLite database indexed by the fingerprint of the scenario
+    options. Adding a model and checking if a model has been trained do not depend on the
+    number of registered models. If a models_stats.csv file exists when the database is
+    created, its content is imported. Until then, models are read from models_stats.csv.
+    """
+
+    FILE_NAME = "models_stats.sqlite"
+    COLUMNS = ["opts_hash", "date", "model_id", "version", "opts"]
+
+    def connect(self):
+        file_utils.ensure_path_exists(self.path, is_file=True)
+        return sqlite3.connect(str(self.path), timeout=self.LOCK_TIMEOUT)
+
+    def create(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS models (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            + "opts_hash TEXT, date TEXT, model_id TEXT, version TEXT, opts TEXT, "
+            + "infos TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS opts_hash_idx ON models (opts_hash)")
+
+    def insert(self, conn, infos):
+        conn.execute(
+            "INSERT INTO models (opts_hash, date, model_id, version, opts, infos) "
+            + "VALUES (?, ?, ?, ?, ?, ?)",
+            [str(infos.get(col, "")) for col in self.COLUMNS]
+            + [json.dumps(infos, default=str)],
+        )
+
+    def get_csv_registry(self):
+        return CSVModelRegistry(self.model_dir, self.ignore_keys)
+
+    def import_csv(self, conn):
+        csv_registry = self.get_csv_registry()
+        models_stats = csv_registry.load()
+        if models_stats is None:
+            return
+        common_utils.print_info(
+            "Importing {} models from {}".format(len(models_stats), csv_registry.path)
+        )
+        models_stats = self.add_fingerprints(models_stats)
+        for infos in models_stats.to_dict("records"):
+            infos = {key: val for key, val in infos.items() if not pd.isna(val)}
+            self.insert(conn, infos)
+
+    def add(self, scenario, infos):
+        infos = dict(infos, opts_hash=self.get_fingerprint(scenario))
+        with self.lock:
+            is_new = not self.exists()
+            with self.connect() as conn:
+                self.create(conn)
+                if is_new:
+                    self.import_csv(conn)
+                self.insert(conn, infos)
+            conn.close()
+
+    def is_trained(self, scenario):
+        if not self.exists():
+            # * The database is only created when a model is added
+            return self.get_csv_registry().is_trained(scenario)
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM models WHERE opts_hash = ? LIMIT 1",
+                (self.get_fingerprint(scenario),),
+            ).fetchone()
+        conn.close()
+        return row is not None
+
+    def load(self):
+        if not self.exists():
+            return self.get_csv_registry().load()
+        with self.connect() as conn:
+            rows = conn.execute("SELECT infos FROM models ORDER BY id").fetchall()
+        conn.close()
+        if not rows:
+            return None
+        return pd.DataFrame([json.loads(row[0]) for row in rows])
+
+
+MODEL_REGISTRIES = {
+    "csv": CSVModelRegistry,
+    "sqlite": SQLiteModelRegistry,
+}
+
+
+def get_model_registry(model_dir, backend=None, ignore_keys=None):
+    """Get the registry of the models trained in a directory
+
+    Args:
+        model_dir (str or pathlib.Path): The directory of the models
+        backend (str, optional): Either "csv" or "sqlite". Defaults to None, meaning that the
+        SQLite registry is used if it exists.
+        ignore_keys (list, optional): Options ignored when identifying a model.
+        Defaults to None, meaning FINGERPRINT_IGNORE_KEYS.
+
+    Raises:
+        ValueError: If the backend is not supported
+
+    Returns:
+        ModelRegistry: The registry
+    """
+    if backend is None:
+        sqlite_registry = SQLiteModelRegistry(model_dir)
+        backend = "sqlite" if sqlite_registry.exists() else "csv"
+    if backend not in MODEL_REGISTRIES:
+        raise ValueError(
+            "Model registry backend {} is not supported. Use one of {}".format(
+                backend, list(MODEL_REGISTRIES.keys())
+            )
+        )
+    return MODEL_REGISTRIES[backend](model_dir, ignore_keys)
@@ -0,0 +1,29 @@
+import pytest
+
+
+@pytest.fixture
+def text_db_opts(tmp_path):
+    """Factory of options of a database with a test dataset. Its data directory contains
+    n_files text files, each containing its index. Additional options override the
+    defaults.
+    """
+
+    def make(n_files=5, **kwargs):
+        data_dir = tmp_path / "data"
+        data_dir.mkdir(exist_ok=True)
+        for i in range(n_files):
+            (data_dir / "{}.txt".format(i)).write_text(str(i))
+        opts = {
+            "name": "test_db",
+            "root_dir": str(tmp_path),
+            "data_dir": "data",
+            "tags_dir": "tags",
+            "dest_dir": "dest",
+            "db_types": ["test"],
+            "data_extensions": [".txt"],
+            "subfolders": [],
+        }
+        opts.update(kwargs)
+        return opts
+
+    return make
@@ -0,0 +1,306 @@
+import multiprocessing
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from mouffet.data import Database, DataHandler, DataLoader, Dataset, Prefetcher
+from mouffet.data import storage
+
+
+class CountLoader(DataLoader):
+    LOADED = []
+
+    def load_file_data(self, file_path, tags_dir, opts, missing=None):
+        self.LOADED.append(file_path.name)
+        if file_path.exists():
+            idx = int(file_path.read_text())
+        else:
+            idx = int(file_path.stem)
+        self.data["data"] += [idx, idx]
+        self.data["tags_df"].append(pd.DataFrame({"file": [idx]}))
+        return idx
+
+    def finalize_dataset(self, missing):
+        self.data["tags_df"] = pd.concat(self.data["tags_df"])
+
+
+def generate(tmp_path, n_workers=1, executor="process"):
+    database = Database(
+        {"name": "test_db", "n_workers": n_workers, "executor": executor}
+    )
+    paths = {"tags": {"test": tmp_path}, "dest": {"test": tmp_path}}
+    loader = CountLoader({"data": [], "tags_df": []})
+    file_list = [tmp_path / "{}.wav".format(i) for i in range(20)]
+    loader.generate_dataset(database, paths, file_list, "test")
+    return loader.data
+
+
+def test_generate_dataset(tmp_path):
+    data = generate(tmp_path)
+    assert data["data"][:4] == [0, 0, 1, 1]
+    assert data["tags_df"].file.tolist() == list(range(20))
+
+
+def test_generate_dataset_parallel(tmp_path):
+    sequential = generate(tmp_path)
+    for executor in ["thread", "process"]:
+        data = generate(tmp_path, n_workers=4, executor=executor)
+        assert data["data"] == sequential["data"]
+        assert data["tags_df"].file.tolist() == sequential["tags_df"].file.tolist()
+
+
+class SumLoader(DataLoader):
+    def load_file_data(self, file_path, tags_dir, opts, missing=None):
+        # * Accumulated values that merge_file_data() does not support
+        self.data["total"] += int(file_path.stem)
+        self.data["sizes"] = np.append(self.data["sizes"], 2)
+
+
+def test_generate_dataset_in_place(tmp_path):
+    database = Database({"name": "test_db"})
+    paths = {"tags": {"test": tmp_path}, "dest": {"test": tmp_path}}
+    loader = SumLoader({"total": 0, "sizes": np.array([])})
+    file_list = [tmp_path / "{}.wav".format(i) for i in range(5)]
+    loader.generate_dataset(database, paths, file_list, "test")
+    assert loader.data["total"] == 10
+    assert loader.data["sizes"].tolist() == [2] * 5
+
+
+class PickleCountLoader(CountLoader):
+    PICKLED_SIZES = []
+
+    def __getstate__(self):
+        self.PICKLED_SIZES.append(len(self.data["data"]))
+        return self.__dict__
+
+
+def test_generate_dataset_parallel_pickling(tmp_path):
+    database = Database({"name": "test_db", "n_workers": 2, "executor": "process"})
+    paths = {"tags": {"test": tmp_path}, "dest": {"test": tmp_path}}
+    loader = PickleCountLoader({"data": [], "tags_df": []})
+    file_list = [tmp_path / "{}.wav".format(i) for i in range(40)]
+    loader.generate_dataset(database, paths, file_list, "test")
+    assert len(loader.data["data"]) == 80
+    # * Tasks sent to the workers never contain the data merged so far
+    assert PickleCountLoader.PICKLED_SIZES
+    assert set(PickleCountLoader.PICKLED_SIZES) == {0}
+
+
+class CountDataset(Dataset):
+    STRUCTURE = {"data": {"type": "data"}, "tags_df": {"type": "tags"}}
+    LOADERS = {"default": CountLoader}
+
+
+class CountDatabase(Database):
+    DATASET = CountDataset
+
+
+def test_generate_incremental(tmp_path, text_db_opts):
+    opts = text_db_opts(incremental=True, file_fingerprint="hash")
+    data_dir = tmp_path / "data"
+    CountDatabase(opts).check_dataset("test")
+    (data_dir / "1.txt").unlink()
+    (data_dir / "3.txt").write_text("30")
+    (data_dir / "5.txt").write_text("5")
+    CountLoader.LOADED.clear()
+    CountDatabase(dict(opts, generate_file_lists=True)).check_database()
+    database = CountDatabase(opts)
+    dataset = database.load_dataset("test", {})
+    assert sorted(CountLoader.LOADED) == ["3.txt", "5.txt"]
+    assert sorted(dataset["data"]) == [0, 0, 2, 2, 4, 4, 5, 5, 30, 30]
+    assert sorted(dataset["tags_df"].file) == [0, 2, 4, 5, 30]
+
+    CountLoader.LOADED.clear()
+    database.check_database()
+    assert not CountLoader.LOADED
+
+
+def test_generate_from_intermediates(tmp_path, text_db_opts):
+    database = CountDatabase(text_db_opts(save_intermediates=True))
+    database.check_dataset("test")
+    for path in database.paths["save_dests"]["test"].values():
+        path.unlink()
+    (tmp_path / "data" / "3.txt").write_text("30")
+    CountLoader.LOADED.clear()
+    dataset = database.load_dataset("test", {})
+    assert CountLoader.LOADED == ["3.txt"]
+    assert sorted(dataset["tags_df"].file) == [0, 1, 2, 4, 30]
+
+
+def test_generate_by_chunks(text_db_opts):
+    database = CountDatabase(text_db_opts(7, chunk_size=3))
+    dataset = database.load_dataset("test", {})
+    assert sorted(dataset["data"]) == sorted(list(range(7)) * 2)
+    assert sorted(dataset["tags_df"].file) == list(range(7))
+
+
+def test_chunk_writer_types(tmp_path):
+    path = tmp_path / "tags.feather"
+    writer = storage.get_storage(path).open_writer(path)
+    # * Columns types change between chunks
+    writer.write(pd.DataFrame({"file": [0, 1], "label": [None, None]}))
+    writer.write(pd.DataFrame({"file": [2.5, None], "label": ["a", "b"]}))
+    writer.write(pd.DataFrame({"label": ["c"], "file": [3]}))
+    writer.close()
+    df = storage.get_storage(path).read(path)
+    assert df.file.tolist()[:3] == [0, 1, 2.5] and df.file.isna().tolist()[3]
+    assert df.label.tolist()[2:] == ["a", "b", "c"] and df.label[:2].isna().all()
+    writer = storage.get_storage(path).open_writer(path)
+    writer.write(pd.DataFrame({"file": [0]}))
+    with pytest.raises(ValueError, match="file"):
+        writer.write(pd.DataFrame({"file": [[0, 1]]}))
+    writer.abort()
+    assert [f.name for f in tmp_path.iterdir()] == ["tags.feather"]
+
+
+def test_load_memory_map(text_db_opts):
+    database = CountDatabase(text_db_opts(3, feather_compression="uncompressed"))
+    dataset = database.load_dataset("test", {"memory_map": True})
+    assert sorted(dataset["tags_df"].file) == [0, 1, 2]
+    dataset = database.load_dataset("test", {"memory_map": True, "as_arrow": True})
+    assert isinstance(dataset["tags_df"], pa.Table)
+    assert dataset["tags_df"].num_rows == 3
+
+
+def test_load_columns_filters(text_db_opts):
+    database = CountDatabase(text_db_opts())
+    dataset = database.load_dataset(
+        "test",
+        {
+            "file_types": ["tags_df"],
+            "columns": {"tags_df": ["file"]},
+            "filters": {"tags_df": {"file": [1, 3]}},
+        },
+    )
+    assert list(dataset["tags_df"].columns) == ["file"]
+    assert sorted(dataset["tags_df"].file) == [1, 3]
+
+
+class ArrayLoader(DataLoader):
+    def load_file_data(self, file_path, tags_dir, opts, missing=None):
+        idx = int(file_path.stem)
+        self.data["data"].append(np.full((2, idx + 1), idx, dtype=np.float32))
+
+
+class ArrayDataset(Dataset):
+    STRUCTURE = {"data": {"type": "data", "extension": "arrays"}}
+    LOADERS = {"default": ArrayLoader}
+
+
+class ArrayDatabase(Database):
+    DATASET = ArrayDataset
+
+
+def test_array_storage(text_db_opts):
+    database = ArrayDatabase(text_db_opts(chunk_size=2))
+    dataset = database.load_dataset("test", {"memory_map": True})
+    assert database.paths["save_dests"]["test"]["data"].suffix == ".arrays"
+    assert len(dataset["data"]) == 5
+    for item in dataset["data"]:
+        idx = int(item[0, 0])
+        assert item.shape == (2, idx + 1)
+        assert (item == idx).all()
+    dataset = database.load_dataset("test", {"lazy": True, "lazy_cache_size": 2})
+    items = dataset["data"][1:3] + [dataset["data"][-1]]
+    assert all(item.shape == (2, int(item[0, 0]) + 1) for item in items)
+    assert len(dataset["data"].cache) == 2
+
+
+class CountDataHandler(DataHandler):
+    DATABASE_CLASS = CountDatabase
+
+
+def test_dataset_cache(text_db_opts):
+    dh = CountDataHandler(
+        text_db_opts(3, dataset_cache_size=1, databases=[{"name": "test_db"}])
+    )
+    database = dh.databases["test_db"]
+    first = dh.load_dataset("test", database, {"file_types": ["data"]})
+    first.data["data"] = None
+    second = dh.load_dataset("test", database, {"file_types": ["data"]})
+    assert len(dh.dataset_cache) == 1
+    assert sorted(second["data"]) == [0, 0, 1, 1, 2, 2]
+    # * Modifying a dataset in place does not change the cached dataset
+    second["data"].append(3)
+    first = dh.load_dataset("test", database, {"file_types": ["tags_df"]})
+    first["tags_df"]["file"] = -1
+    first["tags_df"].drop(first["tags_df"].index[:1], inplace=True)
+    second = dh.load_dataset("test", database, {"file_types": ["tags_df"]})
+    assert sorted(second["tags_df"].file) == [0, 1, 2]
+    assert len(dh.load_dataset("test", database, {"file_types": ["data"]})["data"]) == 6
+
+
+class PrepareDataHandler(CountDataHandler):
+    PREPARE_OPTIONS = ["scale"]
+    PREPARED = 0
+
+    def prepare_dataset(self, dataset, opts):
+        PrepareDataHandler.PREPARED += 1
+        dataset.data["data"] = [x * opts["scale"] for x in dataset.data["data"]]
+        return dataset
+
+
+def test_prepared_dataset_cache(text_db_opts):
+    dh = PrepareDataHandler(
+        text_db_opts(
+            3,
+            dataset_cache_size=1,
+            prepared_dataset_cache_size=2,
+            databases=[{"name": "test_db"}],
+        )
+    )
+    database = dh.databases["test_db"]
+    for scale, learning_rate in [(1, 0.1), (1, 0.01), (2, 0.1)]:
+        dataset = dh.load_dataset(
+            "test",
+            database,
+            {"file_types": ["data"]},
+            prepare=True,
+            prepare_opts={"scale": scale, "learning_rate": learning_rate},
+        )
+        assert sorted(dataset["data"]) == [x * scale for x in [0, 0, 1, 1, 2, 2]]
+    assert PrepareDataHandler.PREPARED == 2
+    dh.clear_cache()
+    assert not dh.prepared_dataset_cache and not dh.dataset_cache
+
+
+def record_square(produced, x):
+    with produced.get_lock():
+        produced.value = max(produced.value, x)
+    return x * x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError("three")
+    return x
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_prefetcher(executor):
+    produced = multiprocessing.Value("i", -1)
+    prefetcher = Prefetcher(
+        range(10),
+        depth=3,
+        executor=executor,
+        transform=partial(record_square, produced),
+    )
+    res = []
+    for x in prefetcher:
+        idx = len(res)
+        # * The next items are produced while the consumer holds the current one
+        deadline = time.time() + 10
+        while produced.value <= min(idx, 8) and time.time() < deadline:
+            time.sleep(0.01)
+        assert produced.value > min(idx, 8)
+        res.append(x)
+    assert res == [x * x for x in range(10)]
+    assert list(prefetcher)[:2] == [0, 1]
+    with pytest.raises(Exception, match="three"):
+        list(Prefetcher(range(5), executor=executor, transform=fail_on_three))
+    for x in Prefetcher(range(100), depth=2, executor=executor):
+        if x == 5:
+            break
@@ -1,2 +1,635 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from mouffet.data import Database, DataHandler, DataLoader, Dataset
+from mouffet.evaluation import (
+    EVALUATORS,
+    EvaluationHandler,
+    Evaluator,
+    PRCurveStore,
+)
+from mouffet.models import DLModel
+from mouffet.plotting import DeferredPlot
+from mouffet.options import ModelOptions
+from mouffet.utils import ModelHandler, common_utils, file_utils
+
+
 def test_test():
     assert 2 + 2 == 4
+
+
+class DummyEvaluationHandler(EvaluationHandler):
+    def predict_database(self, model, database, db_type="test"):
+        return pd.DataFrame(), {}
+
+    def evaluate_scenario(self, opts):
+        db_opts, model_opts, evaluator_opts = opts
+        return {
+            "stats": pd.DataFrame(
+                [
+                    {
+                        "database": db_opts["name"],
+                        "model": model_opts["name"],
+                        "evaluator": evaluator_opts["type"],
+                    }
+                ]
+            )
+        }
+
+
+def get_handler(**kwargs):
+    opts = {
+        "databases": [{"name": "db1"}, {"name": "db2"}],
+        "models": [{"name": "m1"}, {"name": "m2"}, {"name": "m3"}],
+        "evaluators": [{"type": "e1"}, {"type": "e2"}],
+        "save_results": False,
+    }
+    opts.update(kwargs)
+    return DummyEvaluationHandler(opts=opts, dh=DataHandler({"databases": []}))
+
+
+def test_group_scenarios():
+    handler = get_handler()
+    groups = handler.group_scenarios(handler.scenarios)
+    assert len(groups) == 6
+    assert all(len(group) == 2 for group in groups)
+
+
+def test_parallel_evaluation():
+    expected = get_handler().evaluate()["stats"]
+    res = get_handler(n_jobs=3).evaluate()["stats"]
+    assert res.values.tolist() == expected.values.tolist()
+
+
+class PredictEvaluationHandler(EvaluationHandler):
+    LOADED = []
+
+    def load_model(self, model_opts):
+        self.LOADED.append(model_opts.model_id)
+        return model_opts.model_id
+
+    def predict_database(self, model, database, db_type="test"):
+        return pd.DataFrame({"model": [model], "database": [database.name]}), {}
+
+    def evaluate_scenario(self, opts):
+        db_opts, model_opts, evaluator_opts = opts
+        database = DataHandler({"databases": [db_opts]}).databases[db_opts["name"]]
+        preds = self.get_predictions(ModelOptions(model_opts), database)
+        return {"stats": preds.assign(evaluator=evaluator_opts["type"])}
+
+
+def test_shared_predictions(tmp_path):
+    handler = PredictEvaluationHandler(
+        opts={
+            "databases": [{"name": "db1"}],
+            "models": [{"name": "m1", "model_dir": str(tmp_path)}],
+            "evaluators": [{"type": "e1"}, {"type": "e2"}, {"type": "e3"}],
+            "save_results": False,
+            "repredict": True,
+            "predictions_dir": str(tmp_path),
+            "data_config": "",
+        },
+        dh=DataHandler({"databases": []}),
+    )
+    res = handler.evaluate()["stats"]
+    assert handler.LOADED == ["m1"]
+    assert res.evaluator.tolist() == ["e1", "e2", "e3"]
+    assert handler.shared_predictions is None
+
+
+class CountModel(DLModel):
+    CREATED = 0
+
+    def create_model(self):
+        CountModel.CREATED += 1
+        return CountModel.CREATED
+
+    def load_weights(self):
+        pass
+
+    def save_weights(self, path=None):
+        pass
+
+    def train(self, training_data, validation_data):
+        pass
+
+    def predict(self, x):
+        pass
+
+    @property
+    def n_parameters(self):
+        return 10
+
+
+def test_model_cache(tmp_path):
+    model_dir = tmp_path / "m1" / "1"
+    model_dir.mkdir(parents=True)
+    (model_dir / ModelHandler.NETWORK_OPTION_FILENAME).write_text("name: m1\n")
+    opts = {"name": "m1", "model_dir": str(tmp_path), "class": CountModel}
+    ModelHandler.set_model_cache_size(2)
+    try:
+        model = ModelHandler.load_model(ModelOptions(dict(opts, inference=True)))
+        assert (
+            ModelHandler.load_model(ModelOptions(dict(opts, inference=True))) is model
+        )
+        ModelHandler.load_model(ModelOptions(opts))
+        assert CountModel.CREATED == 2
+        ModelHandler.set_model_cache_size(2, max_parameters=5)
+        ModelHandler.load_model(ModelOptions(dict(opts, inference=True)))
+        assert CountModel.CREATED == 3 and not ModelHandler.MODEL_CACHE
+    finally:
+        ModelHandler.set_model_cache_size(0)
+
+
+def test_evaluation_model_cache_size():
+    get_handler(model_cache_size=3, model_cache_max_parameters=10).evaluate()
+    # * The cache is only enabled during the evaluation
+    assert ModelHandler.MODEL_CACHE.maxsize == 0
+    assert ModelHandler.MODEL_CACHE.max_weight == 0
+
+
+class ThresholdEvaluator(Evaluator):
+    def __init__(self, batched):
+        self.batched = batched
+        self.n_evaluations = 0
+
+    def evaluate(self, data, options, infos):
+        self.n_evaluations += 1
+        scores, labels = data
+        stats = self.get_threshold_counts(
+            scores, labels, [options["activity_threshold"]], name="activity_threshold"
+        )
+        return {"stats": stats, "matches": pd.DataFrame()}
+
+    def evaluate_thresholds(self, data, options, thresholds):
+        if not self.batched:
+            return None
+        scores, labels = data
+        name, values = next(iter(thresholds.items()))
+        return {"stats": self.get_threshold_counts(scores, labels, values, name)}
+
+
+def test_evaluate_thresholds():
+    rng = np.random.default_rng(0)
+    scores = rng.random(200).round(2)
+    labels = rng.random(200) > 0.5
+    options = {
+        "do_PR_curve": True,
+        "draw_plots": False,
+        "scenarios_PR_curve": {
+            "activity_threshold": {"start": 0, "end": 1, "step": 0.05}
+        },
+    }
+    loop = ThresholdEvaluator(batched=False)
+    expected = loop.run_evaluation((scores, labels), options, {})["stats"]
+    assert loop.n_evaluations == 21
+    batched = ThresholdEvaluator(batched=True)
+    res = batched.run_evaluation((scores, labels), options, {})["stats"]
+    assert batched.n_evaluations == 0
+    assert res.values.tolist() == expected.values.tolist()
+    threshold = 0.35
+    assert res.true_positives[7] == (labels & (scores >= threshold)).sum()
+    assert res.false_positives[7] == (~labels & (scores >= threshold)).sum()
+
+
+def test_parallel_PR_curve():
+    rng = np.random.default_rng(0)
+    data = (rng.random(100), rng.random(100) > 0.5)
+    options = {
+        "do_PR_curve": True,
+        "draw_plots": False,
+        "scenarios_PR_curve": {
+            "activity_threshold": {"start": 0, "end": 1, "step": 0.1}
+        },
+    }
+    evaluator = ThresholdEvaluator(batched=False)
+    expected = evaluator.run_evaluation(data, options, {})["stats"]
+    res = evaluator.run_evaluation(data, dict(options, PR_curve_n_jobs=3), {})
+    assert res["stats"].values.tolist() == expected.values.tolist()
+
+
+def test_pr_curve_store(tmp_path):
+    legacy = tmp_path / "PR_curves.feather"
+    pd.DataFrame(
+        {"model": ["m1", "m2"], "threshold": [0.5, 0.5], "f1": [0.1, 0.2]}
+    ).to_feather(legacy)
+    store = PRCurveStore(
+        tmp_path / "PR_curves", key_columns=["model", "threshold"], legacy_file=legacy
+    )
+    store.append(pd.DataFrame({"model": ["m1"], "threshold": [0.5], "f1": [0.3]}))
+    store.append(pd.DataFrame({"model": ["m3"], "threshold": [0.5], "f1": [0.4]}))
+    assert len(store.get_fragments()) == 3
+    res = store.load()
+    assert res.values.tolist() == [["m2", 0.5, 0.2], ["m1", 0.5, 0.3], ["m3", 0.5, 0.4]]
+    res = store.load(columns=["f1"], filters={"model": "m1"})
+    assert res.f1.tolist() == [0.3]
+    store.compact()
+    assert len(store.get_fragments()) == 1 and not legacy.exists()
+    assert store.load().f1.tolist() == [0.2, 0.3, 0.4]
+
+
+class ChunkEvaluationHandler(PredictEvaluationHandler):
+    LOADED = []
+
+    def predict_database(self, model, database, db_type="test"):
+        for i in range(3):
+            yield pd.DataFrame({"file": [i, i], "score": [0.1 * i, 0.2 * i]})
+        return {"n_files": 3}
+
+    def evaluate_scenario(self, opts):
+        db_opts, model_opts, evaluator_opts = opts
+        database = DataHandler({"databases": [db_opts]}).databases[db_opts["name"]]
+        preds = self.get_predictions(
+            ModelOptions(model_opts), database, as_chunks=evaluator_opts["chunks"]
+        )
+        if evaluator_opts["chunks"]:
+            n_chunks = len(preds)
+            preds = pd.concat(list(preds))
+        else:
+            n_chunks = 0
+        return {"stats": pd.DataFrame([{"n_rows": len(preds), "n_chunks": n_chunks}])}
+
+
+def test_chunked_predictions(tmp_path):
+    handler = ChunkEvaluationHandler(
+        opts={
+            "databases": [{"name": "db1"}],
+            "models": [{"name": "m1", "model_dir": str(tmp_path)}],
+            "evaluators": [
+                {"type": "e1", "chunks": True},
+                {"type": "e2", "chunks": False},
+            ],
+            "save_results": False,
+            "repredict": True,
+            "predictions_dir": str(tmp_path),
+            "data_config": "",
+        },
+        dh=DataHandler({"databases": []}),
+    )
+    res = handler.evaluate()["stats"]
+    assert res.n_rows.tolist() == [6, 6]
+    assert res.n_chunks.tolist() == [3, 0]
+    assert handler.LOADED == ["m1"]
+    stats = pd.read_csv(tmp_path / handler.PREDICTIONS_STATS_FILE_NAME)
+    assert stats.n_files.tolist() == [3]
+
+
+class SparseChunkEvaluationHandler(ChunkEvaluationHandler):
+    def predict_database(self, model, database, db_type="test"):
+        yield pd.DataFrame()
+        for i in range(3):
+            yield pd.DataFrame({"file": [i, i], "score": [0.1 * i, 0.2 * i]})
+            yield pd.DataFrame()
+        return {"n_files": 3}
+
+
+def test_chunked_predictions_empty_chunks(tmp_path):
+    handler = SparseChunkEvaluationHandler(
+        opts={
+            "databases": [{"name": "db1"}],
+            "models": [{"name": "m1", "model_dir": str(tmp_path)}],
+            "evaluators": [
+                {"type": "e1", "chunks": True},
+                {"type": "e2", "chunks": False},
+            ],
+            "save_results": False,
+            "repredict": True,
+            "predictions_dir": str(tmp_path),
+            "data_config": "",
+        },
+        dh=DataHandler({"databases": []}),
+    )
+    res = handler.evaluate()["stats"]
+    assert res.n_rows.tolist() == [6, 6]
+    assert res.n_chunks.tolist() == [3, 0]
+
+
+class SlowEvaluationHandler(PredictEvaluationHandler):
+    def predict_database(self, model, database, db_type="test"):
+        time.sleep(0.3)
+        with open(Path(self.opts["predictions_dir"]) / "calls.txt", "a") as f:
+            f.write("call\n")
+        return super().predict_database(model, database, db_type)
+
+
+def get_concurrent_predictions(predictions_dir):
+    handler = SlowEvaluationHandler(
+        opts={
+            "databases": [{"name": "db1"}],
+            "models": [{"name": "m1", "model_dir": predictions_dir}],
+            "evaluators": [{"type": "e1"}],
+            "save_results": False,
+            "predictions_dir": predictions_dir,
+            "data_config": "",
+        },
+        dh=DataHandler({"databases": []}),
+    )
+    return handler.evaluate()["stats"].model.tolist()
+
+
+def test_concurrent_predictions(tmp_path):
+    with common_utils.get_executor(3) as executor:
+        res = list(executor.map(get_concurrent_predictions, [str(tmp_path)] * 3))
+    assert res == [["m1"]] * 3
+    assert (tmp_path / "calls.txt").read_text() == "call\n"
+    stats = pd.read_csv(tmp_path / EvaluationHandler.PREDICTIONS_STATS_FILE_NAME)
+    assert len(stats) == 1
+
+
+def test_predictions_cache(tmp_path, text_db_opts):
+    weights_dir = tmp_path / "models" / "m1" / "1"
+    weights_dir.mkdir(parents=True)
+    (weights_dir / "weights").write_text("1")
+    db_opts = text_db_opts(0, name="db1")
+
+    def evaluate(**kwargs):
+        PredictEvaluationHandler.LOADED = []
+        handler = PredictEvaluationHandler(
+            opts={
+                "databases": [dict(db_opts, **kwargs)],
+                "models": [{"name": "m1", "model_dir": str(tmp_path / "models")}],
+                "evaluators": [{"type": "e1"}],
+                "save_results": False,
+                "predictions_dir": str(tmp_path / "predictions"),
+                "predictions_cache": True,
+                "predictions_cache_max_size": 0.0015,
+                "data_config": "",
+            },
+            dh=DataHandler({"databases": []}),
+        )
+        handler.evaluate()
+        return handler.LOADED
+
+    assert evaluate() == ["m1"]
+    assert evaluate() == []
+    # * Database options changed
+    assert evaluate(overlap=0.5) == ["m1"]
+    # * Model weights changed
+    (weights_dir / "weights").write_text("2")
+    assert evaluate() == ["m1"]
+    # * Least recently used predictions are removed from the cache
+    files = list((tmp_path / "predictions").glob("*.feather"))
+    assert len(files) == 1
+    index = json.loads(
+        (tmp_path / "predictions" / "predictions_index.json").read_text()
+    )
+    assert list(index.keys()) == [files[0].name]
+
+
+def test_predictions_eviction(tmp_path):
+    handler = PredictEvaluationHandler(
+        opts={"predictions_dir": str(tmp_path), "data_config": ""},
+        dh=DataHandler({"databases": []}),
+    )
+    df = pd.DataFrame({"model": ["m1"], "score": [0.5]})
+    pred_file = tmp_path / "db1_m1_v1.feather"
+    df.to_feather(pred_file)
+    preds, reader = handler.compute_predictions(
+        ModelOptions({"name": "m1"}), None, pred_file
+    )
+    assert preds is None
+    # * Files used by another process are not removed
+    with file_utils.FileLock(handler.get_lock_path(pred_file)):
+        assert not handler.evict_predictions(pred_file)
+    assert handler.evict_predictions(pred_file) and not pred_file.exists()
+    # * Files opened before being removed can still be read
+    assert reader.read_dataframe().equals(df)
+    assert reader.read_all().equals(df)
+
+
+class CountEvaluator(Evaluator):
+    NAME = "count"
+    N_EVALUATIONS = 0
+    REQUIRES = ["data"]
+
+    def evaluate(self, data, options, infos):
+        CountEvaluator.N_EVALUATIONS += 1
+        preds, tags = data
+        return {
+            "stats": pd.DataFrame(
+                [{"n_preds": len(preds), "n_tags": len(tags["data"])}]
+            )
+        }
+
+
+class TextLoader(DataLoader):
+    def load_file_data(self, file_path, tags_dir, opts, missing=None):
+        self.data["data"].append(int(file_path.read_text()))
+
+
+class TextDataset(Dataset):
+    STRUCTURE = {"data": {"type": "data"}}
+    LOADERS = {"default": TextLoader}
+
+
+class TextDatabase(Database):
+    DATASET = TextDataset
+
+
+class TextDataHandler(DataHandler):
+    DATABASE_CLASS = TextDatabase
+
+
+class PairLoader(DataLoader):
+    def load_file_data(self, file_path, tags_dir, opts, missing=None):
+        value = int(file_path.read_text())
+        self.data["data"].append(value)
+        self.data["extra"].append(-value)
+
+
+class PairDataset(Dataset):
+    STRUCTURE = {"data": {"type": "data"}, "extra": {"type": "extra"}}
+    LOADERS = {"default": PairLoader}
+
+
+class PairDatabase(Database):
+    DATASET = PairDataset
+
+
+class PairDataHandler(DataHandler):
+    DATABASE_CLASS = PairDatabase
+
+
+class CacheEvaluationHandler(PredictEvaluationHandler):
+    LOADED = []
+
+    evaluate_scenario = EvaluationHandler.evaluate_scenario
+
+
+def test_evaluation_cache(tmp_path, text_db_opts):
+    EVALUATORS.register_evaluator(CountEvaluator)
+    db_opts = text_db_opts(3, name="db1")
+
+    def evaluate(models, **kwargs):
+        CountEvaluator.N_EVALUATIONS = 0
+        handler = CacheEvaluationHandler(
+            opts=dict(
+                {
+                    "databases": [{"name": "db1"}],
+                    "models": [
+                        {"name": name, "model_dir": str(tmp_path)} for name in models
+                    ],
+                    "evaluators": [{"type": "count"}],
+                    "save_results": False,
+                    "predictions_dir": str(tmp_path / "predictions"),
+                    "evaluation_dir": str(tmp_path),
+                    "evaluation_cache": True,
+                    "data_config": "",
+                },
+                **kwargs
+            ),
+            dh=TextDataHandler({"databases": [db_opts]}),
+        )
+        res = handler.evaluate()["stats"]
+        assert res.n_preds.tolist() == [1] * len(models)
+        assert res.n_tags.tolist() == [3] * len(models)
+        # * The dataset cache is only used during the evaluation
+        assert handler.data_handler.dataset_cache.maxsize == 0
+        return CountEvaluator.N_EVALUATIONS
+
+    assert evaluate(["m1", "m2"]) == 2
+    assert evaluate(["m1", "m2", "m3"]) == 1
+    assert evaluate(["m1", "m2", "m3"], id="other") == 0
+    assert evaluate(["m1"], evaluators=[{"type": "count", "option": 1}]) == 1
+    assert evaluate(["m1"], reevaluate=True) == 1
+    CountEvaluator.VERSION = 2
+    try:
+        assert evaluate(["m1"]) == 1
+    finally:
+        CountEvaluator.VERSION = 1
+
+
+class LogDataset(TextDataset):
+    def generate(self, file_list, missing, overwrite):
+        with open(Path(self.database.root_dir) / "generated.txt", "a") as f:
+            f.write("{}\n".format(os.getpid()))
+        super().generate(file_list, missing, overwrite)
+
+
+class LogDatabase(Database):
+    DATASET = LogDataset
+
+
+class LogDataHandler(DataHandler):
+    DATABASE_CLASS = LogDatabase
+
+
+def test_parallel_evaluation_datasets(tmp_path, text_db_opts):
+    EVALUATORS.register_evaluator(CountEvaluator)
+    handler = CacheEvaluationHandler(
+        opts={
+            "databases": [{"name": "db1"}],
+            "models": [
+                {"name": name, "model_dir": str(tmp_path)} for name in ["m1", "m2"]
+            ],
+            "evaluators": [{"type": "count"}],
+            "save_results": False,
+            "predictions_dir": str(tmp_path / "predictions"),
+            "n_jobs": 2,
+            "data_config": "",
+        },
+        dh=LogDataHandler({"databases": [text_db_opts(3, name="db1")]}),
+    )
+    res = handler.evaluate()["stats"]
+    assert res.n_tags.tolist() == [3, 3]
+    # * The test dataset is generated once, by the main process
+    assert (tmp_path / "generated.txt").read_text() == "{}\n".format(os.getpid())
+
+
+class DatasetEvaluationHandler(CacheEvaluationHandler):
+    def predict_database(self, model, database, db_type="test"):
+        # * Predicting uses dataset files that the evaluator does not require
+        database.check_dataset(db_type)
+        return super().predict_database(model, database, db_type)
+
+
+def test_predictions_cache_dataset(tmp_path, text_db_opts):
+    EVALUATORS.register_evaluator(CountEvaluator)
+    db_opts = text_db_opts(3, name="db1")
+
+    def evaluate():
+        DatasetEvaluationHandler.LOADED = []
+        handler = DatasetEvaluationHandler(
+            opts={
+                "databases": [{"name": "db1"}],
+                "models": [{"name": "m1", "model_dir": str(tmp_path)}],
+                "evaluators": [{"type": "count"}],
+                "save_results": False,
+                "predictions_dir": str(tmp_path / "predictions"),
+                "predictions_cache": True,
+                "data_config": "",
+            },
+            dh=PairDataHandler({"databases": [db_opts]}),
+        )
+        handler.evaluate()
+        return handler.LOADED
+
+    assert evaluate() == ["m1"]
+    # * The key of the predictions did not change when the dataset was generated
+    assert evaluate() == []
+    assert len(list((tmp_path / "predictions").glob("*.feather"))) == 1
+
+
+def save_as_pdf(values, path):
+    # * Plotting package used to test the saving of plots
+    Path(path).write_text(",".join(str(value) for value in values))
+
+
+def test_deferred_plots(tmp_path):
+    rendered = []
+
+    def draw(value):
+        rendered.append(value)
+        return [value, value * 10]
+
+    def save(**kwargs):
+        handler = get_handler(
+            evaluation_dir=str(tmp_path),
+            save_use_date_subfolder=False,
+            save_use_time_prefix=False,
+            plot_options={key: {"package": __name__} for key in ["a", "b", "g"]},
+            **kwargs
+        )
+        return handler.save_results(
+            {
+                "stats": pd.DataFrame({"PR_curve": [False]}),
+                "plots": {
+                    "a": [DeferredPlot(draw, 1), 5],
+                    "b": [DeferredPlot(draw, 2)],
+                },
+                "global_plots": {"g": DeferredPlot(draw, 3)},
+            }
+        )
+
+    assert save(render_plots=False).keys() == {"stats"}
+    assert not rendered and not list(tmp_path.glob("*.pdf"))
+    file_names = save()
+    assert rendered == [1, 2, 3]
+    assert file_names["plot_a"].read_text() == "1,10,5"
+    assert file_names["global_plot_g"].read_text() == "3,30"
+    for path in tmp_path.glob("*.pdf"):
+        path.unlink()
+    file_names = save(plots_n_jobs=3)
+    assert len(list(tmp_path.glob("*.pdf"))) == 3
+    assert file_names["plot_b"].read_text() == "2,20"
+    assert file_names["global_plot_g"].read_text() == "3,30"
+
+
+class PlotEvaluator(Evaluator):
+    PLOTS = {"title": lambda data, options, infos: options["scenario_info"]["model"]}
+
+    def evaluate(self, data, options, infos):
+        return {"stats": pd.DataFrame(), "plots": self.draw_plots(data, options, infos)}
+
+
+def test_deferred_plots_options():
+    evaluator = PlotEvaluator()
+    options = {"plots": ["title"], "scenario_info": {"model": "m1"}}
+    plots = evaluator.evaluate(None, options, {})["plots"]
+    # * The options of the evaluator are shared and updated by the next scenario
+    options["scenario_info"] = {"model": "m2"}
+    assert plots["title"].render() == "m1"
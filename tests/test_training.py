@@ -2,6 +2,10 @@ from mouffet.training import TrainingHandler
 
 from flowers.data import FlowersDataHandler
 import os
+import sys
+from pathlib import Path
+
+import pytest
 
 
 def test_nscenarios():
@@ -26,3 +30,104 @@ def test_already_trained():
         dh_class=FlowersDataHandler,
     )
     assert trainer.train() == [2]
+
+
+class CrashTrainingHandler(TrainingHandler):
+    def train_scenario(self, scenario):
+        if scenario["name"] == "crash":
+            os._exit(1)
+        if scenario["name"] == "error":
+            raise ValueError("Training error")
+        return scenario["name"]
+
+
+def test_parallel_training():
+    names = ["m1", "crash", "m2", "error", "m3"]
+    trainer = CrashTrainingHandler(
+        opts={
+            "scenarios": [{"name": names}],
+            "n_jobs": 2,
+            "n_threads_per_job": 1,
+        },
+        dh=FlowersDataHandler({"databases": []}),
+    )
+    assert trainer.train() == ["m1", None, "m2", None, "m3"]
+
+
+class ThreadsTrainingHandler(TrainingHandler):
+    def train_scenario(self, scenario):
+        # * Environment of the process when it started, before any library was loaded
+        environ = Path("/proc/self/environ").read_bytes().split(b"\0")
+        return b"OMP_NUM_THREADS=1" in environ
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Requires /proc/self/environ"
+)
+def test_training_threads_limit():
+    previous = os.environ.get("OMP_NUM_THREADS", None)
+    trainer = ThreadsTrainingHandler(
+        opts={
+            "scenarios": [{"name": ["m1", "m2"]}],
+            "n_jobs": 2,
+            "n_threads_per_job": 1,
+        },
+        dh=FlowersDataHandler({"databases": []}),
+    )
+    assert trainer.train() == [True, True]
+    assert os.environ.get("OMP_NUM_THREADS", None) == previous
+
+
+class CacheTrainingHandler(TrainingHandler):
+    def train_scenario(self, scenario):
+        return (
+            self.data_handler.dataset_cache.maxsize,
+            self.data_handler.prepared_dataset_cache.maxsize,
+        )
+
+
+def test_training_dataset_cache():
+    dh = FlowersDataHandler({"databases": []})
+    trainer = CacheTrainingHandler(opts={"scenarios": [{"name": ["m1"]}]}, dh=dh)
+    # * Caching is opt-in
+    assert trainer.train() == [(0, 0)]
+    trainer = CacheTrainingHandler(
+        opts={"scenarios": [{"name": ["m1"]}], "dataset_cache_size": 2}, dh=dh
+    )
+    assert trainer.train() == [(2, 0)]
+    assert dh.dataset_cache.maxsize == 0 and not dh.dataset_cache
+
+
+class CheckDataHandler(FlowersDataHandler):
+    def check_datasets(self, databases=None, db_types=None, force=False):
+        for database in databases:
+            key = (database.name, str(db_types))
+            if key not in self.checked_datasets:
+                self.checked_datasets.add(key)
+                with open(Path(database.root_dir) / "checks.txt", "a") as f:
+                    f.write("{}\n".format(os.getpid()))
+
+
+class DatasetTrainingHandler(TrainingHandler):
+    def train_scenario(self, scenario):
+        self.data_handler.check_datasets(
+            databases=self.get_scenario_databases_options(scenario),
+            db_types=self.DB_TYPES,
+        )
+        return scenario["name"]
+
+
+def test_parallel_training_datasets(tmp_path):
+    trainer = DatasetTrainingHandler(
+        opts={
+            "scenarios": [{"name": ["m1", "m2", "m3"]}],
+            "databases": ["db1"],
+            "n_jobs": 2,
+        },
+        dh=CheckDataHandler(
+            {"databases": [{"name": "db1", "root_dir": str(tmp_path)}]}
+        ),
+    )
+    assert trainer.train() == ["m1", "m2", "m3"]
+    # * Datasets are generated once, by the main process
+    assert (tmp_path / "checks.txt").read_text() == "{}\n".format(os.getpid())
@@ -1,4 +1,8 @@
-from mouffet.utils import common_utils
+import pickle
+
+import pandas as pd
+import pytest
+from mouffet.utils import common_utils, config_utils, file_utils, model_registry
 
 
 def test_dict_update():
@@ -24,3 +28,86 @@ def test_dict_update_copy():
     tmp["b"] = 4
     res = {"a": 3, "b": 4, "c": {"a": 1, "b": 3}}
     assert a != res
+
+
+def test_lru_cache():
+    cache = common_utils.LRUCache(2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache["a"] == 1
+    cache["c"] = 3
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_lru_cache_weight():
+    cache = common_utils.LRUCache(5, max_weight=10)
+    cache.set("a", 1, weight=4)
+    cache.set("b", 2, weight=4)
+    cache.set("c", 3, weight=4)
+    assert "a" not in cache and cache.weight == 8
+    cache.set("d", 4, weight=20)
+    assert "d" not in cache
+    cache.resize(1)
+    assert len(cache) == 1 and "c" in cache
+    copy = pickle.loads(pickle.dumps(cache))
+    assert not copy and copy.maxsize == 1 and copy.max_weight == 10
+
+
+def test_options_fingerprint():
+    assert common_utils.get_options_fingerprint(
+        {"a": 1, "b": {"c": 2, "d": [1, 2]}}
+    ) == common_utils.get_options_fingerprint({"b": {"d": [1, 2], "c": 2}, "a": 1})
+    assert common_utils.get_options_fingerprint(
+        {"a": 1}
+    ) != common_utils.get_options_fingerprint({"a": 2})
+    assert common_utils.get_options_fingerprint(
+        {"a": 1, "b": {"model_dir": "x"}}, ignore_keys=["model_dir"]
+    ) == common_utils.get_options_fingerprint({"a": 1, "b": {}})
+
+
+def test_model_registry(tmp_path):
+    scenario = {"name": "m1", "n_epochs": 2}
+    infos = {"model_id": "m1", "version": 1, "opts": str(scenario), "loss": 0.5}
+    csv_registry = model_registry.get_model_registry(tmp_path, "csv")
+    csv_registry.add(scenario, infos)
+    assert csv_registry.is_trained(scenario)
+    # * Order of options and ignored keys do not change the identity of a model
+    assert csv_registry.is_trained({"n_epochs": 2, "name": "m1", "model_dir": "x"})
+    registry = model_registry.get_model_registry(tmp_path, "sqlite")
+    assert not registry.exists()
+    # * Models are read from the csv file until the database is created
+    assert registry.is_trained(scenario) and not registry.is_trained({"name": "m3"})
+    assert registry.load().model_id.tolist() == ["m1"]
+    assert config_utils.load_models_stats(
+        tmp_path, backend="sqlite"
+    ).model_id.tolist() == ["m1"]
+    assert not registry.exists()
+    other = {"name": "m2", "n_epochs": 2}
+    registry.add(other, dict(infos, model_id="m2", opts=str(other)))
+    # * Models from the csv file are imported when the database is created
+    assert registry.is_trained(scenario) and registry.is_trained(other)
+    assert not registry.is_trained({"name": "m3"})
+    assert isinstance(model_registry.get_model_registry(tmp_path), type(registry))
+    export = registry.export_csv(tmp_path / "export.csv")
+    df = pd.read_csv(export)
+    assert df.model_id.tolist() == ["m1", "m2"] and df.loss.tolist() == [0.5, 0.5]
+    # * Readers use the configured backend, not the most recent registry file
+    assert config_utils.load_models_stats(tmp_path).model_id.tolist() == ["m1"]
+    assert config_utils.load_models_stats(
+        tmp_path, backend="sqlite"
+    ).model_id.tolist() == ["m1", "m2"]
+    config = config_utils.get_models_conf(
+        {"models_list_dir": str(tmp_path), "models_stats_backend": "sqlite"}
+    )
+    assert [model["model_id"] for model in config["models"]] == ["m1", "m2"]
+
+
+def test_file_lock(tmp_path):
+    lock = file_utils.FileLock(tmp_path / "file.lock")
+    with lock:
+        other = file_utils.FileLock(tmp_path / "file.lock", timeout=0.2)
+        with pytest.raises(TimeoutError):
+            other.acquire()
+    with other:
+        pass